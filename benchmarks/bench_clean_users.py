@@ -0,0 +1,84 @@
+"""
+Parity and speed of clean_users_column/capitalize_column against the
+per-cell clean_users/capitalize_values, on synthetic free-text cells.
+
+    python -m benchmarks.bench_clean_users --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.process import clean_users, capitalize_values, clean_users_column, capitalize_column
+
+# forms the per-cell version understands, and the ones it leaves as text
+USER_FORMS = ["{n:,}+", "{n} students", "{n} teachers", "{n}", "{n:,}", "{c} crore", "Not stated"]
+UNIT_FORMS = ["{c} lakh users", "{c} million", "about {n} schools"]
+COUNTRIES = ["kenya", " uganda", "SOUTH AFRICA ", "india , nepal", "côte d'ivoire"]
+
+
+def make_cells(rows, distinct=10_000, seed=0):
+    """
+    Synthetic user counts and country lists, with blanks and integers. The
+    counts come from a pool of `distinct` numbers, as the same product
+    appears on many evidence rows.
+    """
+    rng = np.random.default_rng(seed)
+    forms = np.array(USER_FORMS + UNIT_FORMS, dtype=object)[rng.integers(0, len(USER_FORMS) + len(UNIT_FORMS), rows)]
+    numbers = rng.choice(rng.integers(1, 500_000, distinct), rows)
+    users = [
+        form.format(n=n, c=round(n / 100_000, 1)) for form, n in zip(forms, numbers)
+    ]
+    users = pd.Series(users, dtype=object)
+    users[rng.random(rows) < 0.05] = np.nan
+    ints = rng.random(rows) < 0.05
+    users[ints] = numbers[ints].tolist()
+
+    countries = pd.Series(
+        [",".join(rng.choice(COUNTRIES, k)) for k in rng.integers(1, 4, rows)], dtype=object
+    )
+    countries[rng.random(rows) < 0.05] = np.nan
+    return users, countries
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=10_000, help="distinct user counts")
+    args = parser.parse_args()
+
+    users, countries = make_cells(args.rows, args.distinct)
+
+    # the per-cell version returns text, so its timing includes the conversion to numbers
+    legacy_users, legacy_users_time = timed(
+        lambda s: pd.to_numeric(s.map(lambda v: clean_users(v, "students", "teachers")), errors="coerce"), users
+    )
+    column_users, column_users_time = timed(clean_users_column, users)
+    legacy_caps, legacy_caps_time = timed(lambda s: s.map(capitalize_values), countries)
+    column_caps, column_caps_time = timed(capitalize_column, countries)
+
+    # the per-cell version leaves units other than crore, and leading words, as text
+    comparable = ~users.astype(str).str.contains("lakh|million|about", regex=True)
+    legacy_numbers = legacy_users[comparable].round().astype("Int64")
+    same_users = legacy_numbers.equals(column_users[comparable])
+    same_caps = legacy_caps.equals(column_caps)
+
+    print(f"rows:             {args.rows} ({args.distinct} distinct counts)")
+    print(f"parity:           users={same_users} ({comparable.sum()} comparable cells) capitalize={same_caps}")
+    print(f"clean_users:      {legacy_users_time:.3f}s per cell, {column_users_time:.3f}s column "
+          f"({legacy_users_time / column_users_time:.1f}x)")
+    print(f"capitalize:       {legacy_caps_time:.3f}s per cell, {column_caps_time:.3f}s column "
+          f"({legacy_caps_time / column_caps_time:.1f}x)")
+    print(f"unparsed by cell: {legacy_users.isna().sum() - users.isna().sum()}, "
+          f"by column: {column_users.isna().sum() - users.isna().sum()}")
+
+
+if __name__ == "__main__":
+    main()
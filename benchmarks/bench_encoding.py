@@ -0,0 +1,56 @@
+"""
+Memory of the country and region columns as object strings, categoricals
+(compact_columns) and CSR encodings (encode_cells), and the time of
+build_cube, which explodes the countries through the encodings, on
+synthetic evidence data.
+
+    python -m benchmarks.bench_encoding --rows 1000000
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import make_evidence, country_dict, region_dict
+from src.process import normalize_countries, study_year
+from src.cube import build_cube
+from src.encoding import encode_cells, compact_columns
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def encoded_nbytes(encoded) -> int:
+    """Memory of an encoding, counting the dictionary's strings."""
+    arrays = sum(encoded[key].nbytes for key in ("cells", "offsets", "values"))
+    return arrays + int(encoded["dictionary"].memory_usage(deep=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = make_evidence(args.rows)
+    df["study_year"] = study_year(df["study_date"])
+    normalize_countries(df, "country_of_study", country_dict(), region_dict())
+    studies = df["study_id"].nunique()
+    per_study = lambda nbytes: f"{nbytes / 2**20:8.1f} MB  {nbytes / studies:7.1f} B/study"
+
+    print(f"rows:           {args.rows} ({studies} studies)")
+    for col in ("country_of_study", "region"):
+        encoded, encode_time = timed(encode_cells, df[col])
+        as_object = df[col].memory_usage(deep=True, index=False)
+        as_category = compact_columns(df[[col]].copy(), [col])[col].memory_usage(deep=True, index=False)
+        print(f"{col}:")
+        print(f"  object        {per_study(as_object)}")
+        print(f"  categorical   {per_study(as_category)}")
+        print(f"  csr           {per_study(encoded_nbytes(encoded))} (encoded in {encode_time:.3f}s)")
+
+    cube, cube_time = timed(build_cube, df, region_dict())
+    print(f"cube:           {len(cube)} rows in {cube_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
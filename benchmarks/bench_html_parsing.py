@@ -0,0 +1,170 @@
+"""
+Parity and speed of the lxml parsers of the country alias pages against the
+BeautifulSoup/iterrows versions they replaced, on generated pages of the
+Wikipedia layout or on saved copies of the real ones.
+
+    python -m benchmarks.bench_html_parsing [--rows 5000] [--fixture-dir data/fixtures]
+"""
+import io
+import argparse
+import time
+
+import pandas as pd
+import yaml
+
+from src.fetch import fixture_name
+from src.get_countries import country_dict, parse_countries, parse_iso_standards
+
+# filler around the tables, as the navigation and reference markup of the real pages
+PAGE_NOISE = "".join(
+    f'<div class="navbox"><ul>{"".join(f"<li><a href=#{i}-{j}>Link {j}</a></li>" for j in range(40))}</ul></div>'
+    for i in range(50)
+)
+
+
+def legacy_parse_countries(html):
+    """The BeautifulSoup implementation, kept as the reference for parity."""
+    from bs4 import BeautifulSoup as BSoup
+
+    soup = BSoup(html, "lxml")
+
+    tables = soup.select("table.wikitable")
+
+    country_list = []
+    for table in tables:
+        table_rows = table.find_all("tr")
+        for row in table_rows[1:]:
+            row_contents = row.find_all("td")
+            alpha_code = row_contents[0].text.strip()
+            country = row_contents[1].find("a").text.strip()
+            alternatives = [c.text.strip() for c in row_contents[2].find_all("b")]
+            country_list.append([alpha_code,country,alternatives])
+
+    country_list_df = pd.DataFrame(country_list)
+    country_list_df.columns = ["iso_3","Official name","Alternatives"]
+
+    full_dict = {}
+    for r, row in country_list_df.iterrows():
+        full_dict.update(country_dict(row))
+
+    return country_list_df, full_dict
+
+
+def legacy_parse_iso_standards(html):
+    """The per-character footnote stripping, kept as the reference for parity."""
+    # Parse all tables into a list of DataFrames
+    tables = pd.read_html(io.StringIO(html))
+    df = tables[0]
+    cols = ["ISO name","Official name", "Sovereignty","ISO-2","ISO-3","Num","Subdivision codes","TLD"]
+    df.columns = cols
+    new_rows = []
+    def clean_rows(row):
+        iso_name = row[cols[0]]
+        off_name = row[cols[1]]
+        iso_2 = row[cols[3]]
+        iso_3 = row[cols[4]]
+
+        if pd.notna(iso_name):
+            for x,nn in enumerate(iso_name):
+                if nn == "[":
+                    iso_name = iso_name[:x]
+        if pd.notna(off_name):
+            for x,nn in enumerate(off_name):
+                if nn == "[":
+                    off_name = off_name[:x]
+        if pd.notna(iso_2):
+            for x,nn in enumerate(iso_2):
+                if nn == "[":
+                    iso_2 = iso_2[:x]
+        if pd.notna(iso_3):
+            for x,nn in enumerate(iso_3):
+                if nn == "[":
+                    iso_3 = iso_3[:x]
+        
+        new_rows.append([iso_name, off_name, iso_2, iso_3])
+
+    for k,row in df.iterrows():
+        clean_rows(row)
+    countries_df = pd.DataFrame(new_rows)
+    countries_df.columns = ["iso_name","official_name","iso_2","iso_3"]
+    return countries_df
+
+
+def make_pages(rows):
+    """(alias page, ISO page) with rows countries each, split over several tables as on Wikipedia."""
+    alias_tables = []
+    for start in range(0, rows, 250):
+        body = "".join(
+            f"<tr><td>C{i:02X}{'' if i % 97 else ' '}</td>"
+            f'<td><span class="flag"></span> <a href="/wiki/{i}">Country {i}</a> <sup><a>[{i % 3}]</a></sup></td>'
+            f"<td><b>Country {i}</b>, <i>formerly</i> <b>Old Country {i}</b>"
+            f"{f'; <b>Republic of {i}</b>' if i % 2 else ''} (<a>language</a>)</td></tr>"
+            for i in range(start, min(start + 250, rows))
+        )
+        alias_tables.append(
+            f'<table class="wikitable sortable"><tbody><tr><th>Code</th><th>Name</th><th>Alternatives</th></tr>{body}</tbody></table>'
+        )
+    alias_page = f"<html><body>{PAGE_NOISE}{''.join(alias_tables)}{PAGE_NOISE}</body></html>"
+
+    iso_body = "".join(
+        f"<tr><td>Country {i}{'[a]' if i % 5 == 0 else ''}</td><td>Republic of {i}{'[b][c]' if i % 7 == 0 else ''}</td>"
+        f"<td>UN member</td><td>{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}{'[d]' if i % 11 == 0 else ''}</td>"
+        f"<td>C{i:02X}</td><td>{i:03d}</td><td>ISO 3166-2:{i}</td><td>.c{i}</td></tr>"
+        for i in range(rows)
+    )
+    iso_page = (
+        f"<html><body>{PAGE_NOISE}<table class=\"wikitable sortable\"><tr>"
+        f"{''.join(f'<th>Col {j}</th>' for j in range(8))}</tr>{iso_body}</table>"
+        f"<table class=\"wikitable\"><tr><th>Note</th></tr><tr><td>unrelated</td></tr></table>{PAGE_NOISE}</body></html>"
+    )
+    return alias_page, iso_page
+
+
+def read_fixtures(fixture_dir, config="config.yaml"):
+    """The saved alias and ISO pages of the urls in config.yaml, named as src.fetch names fixtures."""
+    with open(config) as file:
+        params = yaml.safe_load(file)
+    return tuple(
+        open(f"{fixture_dir}/{fixture_name(params[key])}", encoding="utf-8").read()
+        for key in ("wiki_countries_url", "country_codes_url")
+    )
+
+
+def timed(func, *args, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000, help="countries per generated page")
+    parser.add_argument("--fixture-dir", help="parse the saved real pages in this directory instead")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    alias_page, iso_page = read_fixtures(args.fixture_dir) if args.fixture_dir else make_pages(args.rows)
+
+    (legacy_df, legacy_dict), legacy_countries_time = timed(legacy_parse_countries, alias_page, repeat=args.repeat)
+    (new_df, new_dict), countries_time = timed(parse_countries, alias_page, repeat=args.repeat)
+    legacy_iso, legacy_iso_time = timed(legacy_parse_iso_standards, iso_page, repeat=args.repeat)
+    new_iso, iso_time = timed(parse_iso_standards, iso_page, repeat=args.repeat)
+
+    same_countries = legacy_df.equals(new_df) and list(legacy_dict.items()) == list(new_dict.items())
+    same_iso = legacy_iso.equals(new_iso)
+
+    print(f"pages:            {'saved in ' + args.fixture_dir if args.fixture_dir else f'{args.rows} generated rows'} "
+          f"({len(alias_page) / 2**20:.1f} MB, {len(iso_page) / 2**20:.1f} MB)")
+    print(f"parity:           countries={same_countries} ({len(new_df)} rows, {len(new_dict)} aliases) "
+          f"iso={same_iso} ({len(new_iso)} rows)")
+    print(f"parse_countries:  {legacy_countries_time:.3f}s bs4, {countries_time:.3f}s lxml "
+          f"({legacy_countries_time / countries_time:.1f}x)")
+    print(f"parse_iso:        {legacy_iso_time:.3f}s per character, {iso_time:.3f}s vectorized "
+          f"({legacy_iso_time / iso_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
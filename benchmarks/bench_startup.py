@@ -0,0 +1,51 @@
+"""
+Import time of the entry points, each in a fresh interpreter with
+python -X importtime, against a budget, and which of the heavy plotting
+and scraping modules they load.
+
+    python -m benchmarks.bench_startup [--budget-ms 800] [--repeat 3]
+"""
+import sys
+import argparse
+import subprocess
+
+ENTRY_POINTS = ["pandas", "src.pipeline", "src.export", "src.cli", "functions"]
+# loaded lazily, by the code paths that draw, fetch or fuzzy-match
+HEAVY_MODULES = ["matplotlib", "geopandas", "requests", "lxml", "rapidfuzz"]
+
+
+def import_time(module):
+    """(cumulative import time in ms, heavy modules loaded) of module in a fresh interpreter."""
+    code = f"import sys, {module}; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000, result.stdout.split()
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=800, help="per entry point, pandas included")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    args = parser.parse_args()
+
+    over = []
+    for module in ENTRY_POINTS:
+        runs = [import_time(module) for _ in range(args.repeat)]
+        ms, heavy = min(runs)
+        status = "ok" if ms <= args.budget_ms else "OVER"
+        if ms > args.budget_ms:
+            over.append(module)
+        print(f"{module:<14} {ms:8.1f} ms  {status:<4}  heavy: {', '.join(heavy) or '-'}")
+
+    print(f"budget: {args.budget_ms:.0f} ms")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Parity, time and peak traced memory of the chunked aggregates
+(src.streaming) against loading the whole evidence csv into the cube, on a
+synthetic csv.
+
+    python -m benchmarks.bench_streaming --rows 1000000 --chunksize 100000 [--studies 50000]
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.synthetic import make_evidence, country_dict, region_dict
+from src.loaders import read_evidence_csv
+from src.process import study_year, normalize_countries
+from src.cube import build_cube
+from src.export import aggregate_tables
+from src.streaming import stream_counts
+
+
+def whole_file_counts(path):
+    df = read_evidence_csv(path)
+    df["study_year"] = study_year(df["study_date"])
+    normalize_countries(df, "country_of_study", country_dict(), fuzzy=False)
+    return aggregate_tables(build_cube(df, region_dict()))
+
+
+def traced(func, *args, **kwargs):
+    """(result, seconds, peak traced MB): timed in one call, traced in another, as tracing slows it down."""
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--studies", type=int, help="distinct studies (default: 70%% of rows, as synthetic.make_evidence)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "evidence.csv"
+        make_evidence(args.rows, studies=args.studies).to_csv(path, index=False)
+
+        expected, whole_time, whole_peak = traced(whole_file_counts, path)
+        tables, stream_time, stream_peak = traced(
+            stream_counts, path, country_dict(), region_dict(), args.chunksize, fuzzy=False, log=lambda message: None
+        )
+        size = path.stat().st_size
+
+    same = all(expected[name].equals(tables[name]) for name in expected)
+    print(f"csv:          {args.rows} rows, {size / 2**20:.0f} MB, {args.studies or 'default'} studies")
+    print(f"parity:       {same}")
+    print(f"whole file:   {whole_time:7.2f} s  {whole_peak:8.1f} MB peak")
+    print(f"chunked:      {stream_time:7.2f} s  {stream_peak:8.1f} MB peak ({args.chunksize} rows per chunk)")
+
+
+if __name__ == "__main__":
+    main()
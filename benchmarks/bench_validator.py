@@ -0,0 +1,74 @@
+"""
+Parity and speed of the vectorized validator against the row-by-row version
+it replaced, on synthetic evidence data.
+
+    python -m benchmarks.bench_validator --rows 100000
+"""
+import io
+import argparse
+import contextlib
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_evidence
+from functions import validator
+
+
+def legacy_validator(df):
+    """The iterrows implementation, kept as the reference for parity."""
+    for i,row in df.iterrows():
+        rej_keys = [key for key in row.keys() if "rejection_criterion" in key]
+        validation_num = row["validation_number"]
+        if validation_num == 1:
+            if not all(pd.isna(row[rej_key]) for rej_key in rej_keys):
+                print("Flag-0")
+        elif validation_num == 2:
+            if pd.isna(row[rej_keys[0]]):
+                print("Flag-1-0")
+        elif validation_num == 3:
+            if pd.isna(row[rej_keys[0]]):
+                print("Flag-2-0")
+            if pd.isna(row[rej_keys[1]]):
+                print("Flag-2-1")
+                df.loc[i, rej_keys[1]] = row[rej_keys[0]]
+        elif validation_num == 4:
+            if pd.isna(row[rej_keys[0]]):
+                print("Flag-3-0")
+            if pd.isna(row[rej_keys[0]]):
+                print("Flag-3-1")
+                df.loc[i, rej_keys[1]] = row[rej_keys[0]]
+            if pd.isna(row[rej_keys[2]]):
+                print("Flag-3-2")
+                df.loc[i, rej_keys[2]] = row[rej_keys[1]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    data = make_evidence(args.rows).filter(regex="validation_number|rejection_criterion")
+    legacy_df, vector_df = data.copy(), data.copy()
+
+    start = time.perf_counter()
+    printed = io.StringIO()
+    with contextlib.redirect_stdout(printed):
+        legacy_validator(legacy_df)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    flags = validator(vector_df)
+    vector_time = time.perf_counter() - start
+
+    same_data = legacy_df.equals(vector_df)
+    same_flags = printed.getvalue().split() == flags["flag"].tolist()
+    print(f"rows:       {args.rows}")
+    print(f"flags:      {len(flags)}")
+    print(f"parity:     data={same_data} flags={same_flags}")
+    print(f"iterrows:   {legacy_time:.3f}s")
+    print(f"vectorized: {vector_time:.3f}s ({legacy_time / vector_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Time and peak memory of the evidence-analysis hot paths on synthetic data,
+offline. Each case gets a fresh copy of its input; the time is the best of
+--repeat runs and the memory the peak traced by tracemalloc in one run.
+
+    python -m benchmarks.suite [--rows 10000 100000] [--cases validator ...]
+                               [--save results.json] [--compare baseline.json]
+"""
+import gc
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.synthetic import SIZES, make_evidence, make_agent_values, country_dict, region_dict
+from functions import validator, country_to_region, create_ids_save, _tier_counts
+from src.process import (
+    country_cleaning,
+    normalize_countries,
+    study_year,
+    build_long_table,
+    clean_agents_data,
+    clean_agents_column,
+    _clean_agents_string,
+)
+from src.cube import build_cube, cube_counts
+from src.study_index import build_study_index, index_counts
+
+
+def _normalized(df):
+    df = df.copy()
+    df["study_year"] = study_year(df["study_date"])
+    return normalize_countries(df, "country_of_study", country_dict(), region_dict(), fuzzy=False)
+
+def _distribution_counts(df):
+    long_df = build_long_table(df)
+    return [_tier_counts(df, col, "validation_number", long_df) for col in ("country_of_study", "region", "study_year")]
+
+def _cube_counts(df):
+    cube = build_cube(df, region_dict())
+    return [cube_counts(cube, col) for col in ("country_of_study", "region", "study_year")]
+
+# the tier slices of study_distribution_map.py, counted per country
+MAP_SLICES = [{}, {"validation_number": [1, 2, 3, 4]}, *({"validation_number": tier} for tier in range(1, 5))]
+
+def _sliced_counts(cube):
+    return [cube_counts(cube, "country_of_study", **filters) for filters in MAP_SLICES]
+
+def _indexed_counts(cube):
+    index = build_study_index(cube)
+    return [index_counts(index, "country_of_study", **filters) for filters in MAP_SLICES]
+
+def _agents_map(values):
+    _clean_agents_string.cache_clear()
+    return values.map(clean_agents_data)
+
+def _agents_column(values):
+    _clean_agents_string.cache_clear()
+    return clean_agents_column(values)
+
+# name: (input builder from the raw evidence rows, function timed on a copy of that input)
+CASES = {
+    "validator": (lambda df: df, validator),
+    "country_cleaning": (lambda df: df, lambda df: country_cleaning(df, "country_of_study", country_dict())),
+    "normalize_countries": (lambda df: df, _normalized),
+    "country_to_region": (
+        lambda df: _normalized(df)["country_of_study"],
+        lambda values: values.apply(country_to_region, args=(region_dict(),)),
+    ),
+    "study_year": (lambda df: df["study_date"], study_year),
+    "create_ids_save": (lambda df: df, lambda df: create_ids_save(df, "rejection_criterion_level")),
+    "distribution_counts": (_normalized, _distribution_counts),
+    "cube_counts": (_normalized, _cube_counts),
+    "sliced_counts": (lambda df: build_cube(_normalized(df), region_dict()), _sliced_counts),
+    "indexed_counts": (lambda df: build_cube(_normalized(df), region_dict()), _indexed_counts),
+    "clean_agents_data": (lambda df: make_agent_values(len(df)), _agents_map),
+    "clean_agents_column": (lambda df: make_agent_values(len(df)), _agents_column),
+}
+
+
+def measure(func, data, repeat):
+    """(best time in seconds, peak traced memory in MB) of func on copies of data."""
+    times = []
+    for _ in range(repeat):
+        copy = data.copy()
+        gc.collect()
+        start = time.perf_counter()
+        func(copy)
+        times.append(time.perf_counter() - start)
+
+    copy = data.copy()
+    gc.collect()
+    tracemalloc.start()
+    func(copy)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak / 2**20
+
+
+def run_suite(sizes, cases, repeat=3, log=print) -> list:
+    """One {case, rows, seconds, peak_mb} record per case and size."""
+    results = []
+    for rows in sizes:
+        raw = make_evidence(rows)
+        for name in cases:
+            build, func = CASES[name]
+            seconds, peak_mb = measure(func, build(raw), repeat)
+            results.append({"case": name, "rows": rows, "seconds": seconds, "peak_mb": peak_mb})
+            log(f"{name:<22} {rows:>9,} rows  {seconds:9.3f} s  {peak_mb:9.1f} MB")
+    return results
+
+
+def compare(results, baseline):
+    """Print the time and memory ratios against a saved run, for the cases both have."""
+    before = {(r["case"], r["rows"]): r for r in baseline}
+    for result in results:
+        old = before.get((result["case"], result["rows"]))
+        if old:
+            print(
+                f"{result['case']:<22} {result['rows']:>9,} rows  "
+                f"time x{result['seconds'] / old['seconds']:.2f}  memory x{result['peak_mb'] / max(old['peak_mb'], 1e-9):.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[SIZES["10k"], SIZES["100k"]],
+                        help="data sizes (the 1M size is 1000000)")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="write the results to this json file")
+    parser.add_argument("--compare", help="json file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = run_suite(args.rows, args.cases, args.repeat)
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({"python": sys.version.split()[0], "pandas": pd.__version__, "results": results}, file, indent=1)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file)["results"])
+
+
+if __name__ == "__main__":
+    main()
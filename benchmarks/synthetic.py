@@ -0,0 +1,145 @@
+"""
+Synthetic evidence data with the schema of the evidence csv, for the
+benchmarks: no network access or real export needed.
+
+    python -m benchmarks.synthetic --rows 100000 --out data/synthetic_evidence.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# (name, ISO-2, ISO-3, region) of the countries studies are drawn from
+COUNTRIES = [
+    ("Kenya", "KE", "KEN", "Sub-Saharan Africa"),
+    ("Uganda", "UG", "UGA", "Sub-Saharan Africa"),
+    ("Tanzania", "TZ", "TZA", "Sub-Saharan Africa"),
+    ("Nigeria", "NG", "NGA", "Sub-Saharan Africa"),
+    ("Ghana", "GH", "GHA", "Sub-Saharan Africa"),
+    ("Ethiopia", "ET", "ETH", "Sub-Saharan Africa"),
+    ("Rwanda", "RW", "RWA", "Sub-Saharan Africa"),
+    ("Malawi", "MW", "MWI", "Sub-Saharan Africa"),
+    ("South Africa", "ZA", "ZAF", "Sub-Saharan Africa"),
+    ("Côte d'Ivoire", "CI", "CIV", "Sub-Saharan Africa"),
+    ("Democratic Republic of the Congo", "CD", "COD", "Sub-Saharan Africa"),
+    ("Sierra Leone", "SL", "SLE", "Sub-Saharan Africa"),
+    ("India", "IN", "IND", "South Asia"),
+    ("Pakistan", "PK", "PAK", "South Asia"),
+    ("Bangladesh", "BD", "BGD", "South Asia"),
+    ("Nepal", "NP", "NPL", "South Asia"),
+    ("Sri Lanka", "LK", "LKA", "South Asia"),
+    ("Brazil", "BR", "BRA", "MIC"),
+    ("Mexico", "MX", "MEX", "MIC"),
+    ("Indonesia", "ID", "IDN", "MIC"),
+    ("Philippines", "PH", "PHL", "LMIC"),
+    ("Egypt", "EG", "EGY", "LMIC"),
+    ("United States", "US", "USA", "HIC"),
+    ("United Kingdom", "GB", "GBR", "HIC"),
+    ("Chile", "CL", "CHL", "HIC"),
+]
+DATES = ["2019-05-01", "2021-11", "2018", "2017, 2019", "2020-2021", "2015", "n.d.", None]
+DATE_WEIGHTS = [0.3, 0.1, 0.25, 0.1, 0.1, 0.1, 0.02, 0.03]
+TIER_WEIGHTS = [0.1, 0.15, 0.2, 0.25, 0.3]
+REJECTION_REASONS = [f"Rejection reason {i}: study design does not meet criterion {i}" for i in range(1, 26)]
+AGENT_KEYS = ["name", "value", "use_case", "type"]
+
+
+def country_dict() -> dict:
+    """ISO-2/ISO-3 code -> country name, as load_country_aliases returns it."""
+    return {code: name for name, iso_2, iso_3, _ in COUNTRIES for code in (iso_2, iso_3)}
+
+
+def region_dict() -> dict:
+    """Country name -> region, as load_regions returns it."""
+    return {name: region for name, _, _, region in COUNTRIES}
+
+
+def _country_cells(rng, count):
+    """
+    Distinct comma-separated country cells: one to three countries written
+    as names, ISO codes or unknown aliases.
+    """
+    names = np.array([name for name, *_ in COUNTRIES], dtype=object)
+    codes = np.array([iso for _, iso, *_ in COUNTRIES], dtype=object)
+    cells = []
+    for size in rng.integers(1, 4, count):
+        picks = rng.choice(len(COUNTRIES), size, replace=False)
+        written = np.where(rng.random(size) < 0.3, codes[picks], names[picks])
+        if rng.random() < 0.03:
+            written[0] = "Global"
+        cells.append(", ".join(written))
+    return np.array(cells, dtype=object)
+
+
+def make_evidence(rows, seed=0, studies=None, products=300, distinct_countries=5000) -> pd.DataFrame:
+    """
+    Evidence rows with the columns of the evidence csv. Studies repeat across
+    rows (studies defaults to 70% of rows), countries are drawn from a pool
+    of distinct cells, and blank rejection criteria are more frequent at the
+    deeper levels, as in the real exports.
+    """
+    rng = np.random.default_rng(seed)
+    studies = studies or max(1, int(rows * 0.7))
+    tiers = rng.choice(np.arange(1, 6), rows, p=TIER_WEIGHTS)
+
+    countries = _country_cells(rng, distinct_countries)[rng.integers(0, distinct_countries, rows)]
+    countries[rng.random(rows) < 0.05] = None
+
+    df = pd.DataFrame({
+        "study_id": pd.Series(rng.integers(0, studies, rows)).map("S{:07d}".format),
+        "product_id": pd.Series(rng.integers(0, products, rows)).map("P{:04d}".format),
+        "validation_number": tiers,
+        "design_categorization_number": rng.integers(1, 6, rows),
+        "country_of_study": countries,
+        "study_date": rng.choice(np.array(DATES, dtype=object), rows, p=DATE_WEIGHTS),
+    })
+
+    reasons = np.array(REJECTION_REASONS, dtype=object)
+    for level in range(1, 5):
+        values = reasons[rng.integers(0, len(reasons), rows)]
+        values[(rng.random(rows) < 0.15 * level) | (tiers == 1)] = None
+        df[f"rejection_criterion_level_{level}"] = values
+    return df
+
+
+def make_agent_values(rows, seed=0, distinct=2000) -> pd.Series:
+    """
+    Serialized agent outputs as clean_agents_data receives them: lists of
+    dicts or strings, single dicts, plain text, integers and blanks.
+    """
+    rng = np.random.default_rng(seed)
+    pool = []
+    for i in range(distinct):
+        kind = i % 5
+        items = [f"Item {j}" for j in rng.integers(0, 500, rng.integers(1, 4))]
+        if kind == 0:
+            key = AGENT_KEYS[i % len(AGENT_KEYS)]
+            pool.append(str([{key: item, "confidence": 0.9} for item in items]))
+        elif kind == 1:
+            pool.append(str(items))
+        elif kind == 2:
+            pool.append(str({"value": items[0]}))
+        elif kind == 3:
+            pool.append(f"Free text answer {i}")
+        else:
+            pool.append(int(rng.integers(0, 10_000)))
+    values = pd.Series(np.array(pool, dtype=object)[rng.integers(0, distinct, rows)])
+    values[rng.random(rows) < 0.05] = None
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=SIZES["100k"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="data/synthetic_evidence.csv")
+    args = parser.parse_args()
+
+    make_evidence(args.rows, args.seed).to_csv(args.out, index=False)
+    print(args.out)
+
+
+if __name__ == "__main__":
+    main()
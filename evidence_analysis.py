@@ -1,19 +1,22 @@
 #%%
 from pathlib import Path
 import yaml
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
-from src.get_countries import retrieve_countries, country_iso_standards
+from src.get_countries import load_country_aliases
 from src.process import ( 
-    country_cleaning
+    normalize_countries,
+    study_year
 )
+from src.loaders import load_evidence
+from src.pipeline import load_regions
+from src.cache import CACHE_DIR
+from src.cube import load_cube
+from src.profiling import stage, write_report
 
 from functions import (
     plot_country_distribution_by_tier, 
     plot_tier_distribution, 
-    country_to_region,
     plot_region_distribution_by_tier,
     plot_studyyear_distribution_by_tier
 )
@@ -34,12 +37,15 @@ country_iso_url = params["country_codes_url"]
 headers = params["headers"]
 
 # %%
-evidence_data = pd.read_csv(evidence_path)
-evidence_data["study_year"] = evidence_data["study_date"].apply(lambda x: pd.to_datetime(x).year if len(x.split("-")) >= 2 else x)
-region_data = pd.read_csv(region_path, encoding="cp1252")
-region_data["country"] = region_data["country"].str.replace("'","").str.replace(",","").str.replace('"','').str.strip()
-region_data.dropna(subset=["class_region"], inplace=True, ignore_index=True)
-region_data_dict = region_data.set_index("country")["class_region"].to_dict()
+## stages are timed when ESSA_PROFILE is set (see src/profiling.py)
+with stage("load") as record:
+    evidence_data = load_evidence(evidence_path)
+    evidence_data["study_year"] = study_year(evidence_data["study_date"])
+    record["rows_out"] = evidence_data
+
+with stage("regions") as record:
+    region_data_dict = load_regions(region_path)
+    record["rows_out"] = len(region_data_dict)
 
 # %%
 total_products = 287
@@ -54,52 +60,57 @@ evidence_data["validation_number"] = evidence_data["validation_number"].apply(la
 validation_tiers = np.sort(evidence_data["validation_number"].unique())
 
 # %%
-plot_tier_distribution(evidence_data, total_products, save_path="data/charts/tier_distribution.png")
+with stage("plot-tiers", evidence_data):
+    plot_tier_distribution(evidence_data, total_products, save_path="data/charts/tier_distribution.png")
 
 # %%
-### map ISO-2 countries to their official names
-standard_countries = country_iso_standards(country_iso_url, headers)
-# standard_countries.loc[
-#     standard_countries["iso_name"] == "Namibia", "iso_2"
-# ] = "NA"
-alternative_countries = retrieve_countries(wiki_countries_URL, headers)
-alternative_countries[0].loc[
-    alternative_countries[0]["Official name"] == "Kosovo", "iso_3"
-] = "XKX"
-clean_countries = alternative_countries[0][alternative_countries[0]["iso_3"] != '']
-merged_countries = clean_countries.merge(standard_countries[["iso_2", "iso_3"]], on="iso_3")
-alt_country_dict = merged_countries.set_index("iso_3")["Official name"].to_dict()
-alt_country_dict.update(merged_countries.set_index("iso_2")["Official name"].to_dict())
-alternative_countries = retrieve_countries(wiki_countries_URL, headers)
-[country_cleaning(evidence_data, "country_of_study", alt_country_dict) ]
-
-# get regions for the countries
-evidence_data["region"] = evidence_data["country_of_study"].apply(
-    lambda x: country_to_region(x, region_data_dict)
-)
+### map ISO-2/ISO-3 codes to their official names (cached snapshot, see src/get_countries.py)
+with stage("aliases") as record:
+    alt_country_dict = load_country_aliases(wiki_countries_URL, country_iso_url, headers)
+    record["rows_out"] = len(alt_country_dict)
+
+# normalize the countries and get their regions in one pass; aliases still unknown are fuzzy-matched
+with stage("normalize", evidence_data) as record:
+    normalize_countries(
+        evidence_data, "country_of_study", alt_country_dict, region_data_dict, fuzzy=True, cache_dir=CACHE_DIR
+    )
+    record["rows_out"] = evidence_data
+
+# distinct (study, tier, country, region, year, design) rows the charts below roll up
+with stage("aggregate", evidence_data) as record:
+    cube = load_cube(
+        evidence_data, region_data_dict, source=evidence_path, country_dict=alt_country_dict, cache_name="cube-analysis"
+    )
+    record["rows_out"] = cube
 
 # %%
 # country distribution by tier
-df = evidence_data.copy()
-pivot_data = plot_country_distribution_by_tier(
-    df,
-    country_col="country_of_study",
-    tier_col="validation_number",
-    product_col="product_id",
-    top_n=15,
-    save_path="data/charts/country_distribution.png"
-)
+with stage("plot-countries", cube):
+    pivot_data = plot_country_distribution_by_tier(
+        evidence_data,
+        country_col="country_of_study",
+        tier_col="validation_number",
+        product_col="product_id",
+        top_n=15,
+        save_path="data/charts/country_distribution.png",
+        cube=cube
+    )
 
 # %%
 # region distribution by tier
-plot_region_distribution_by_tier(
-    evidence_data,
-    save_path="data/charts/region_distribution.png"
-)
+with stage("plot-regions", cube):
+    plot_region_distribution_by_tier(
+        evidence_data,
+        save_path="data/charts/region_distribution.png",
+        cube=cube
+    )
 # %%
 # study year
-plot_studyyear_distribution_by_tier(
-    evidence_data,
-    save_path="data/charts/studyyear_distribution.png"
-)
+with stage("plot-years", cube):
+    plot_studyyear_distribution_by_tier(
+        evidence_data,
+        save_path="data/charts/studyyear_distribution.png",
+        cube=cube
+    )
 # %%
+write_report()
@@ -1,15 +1,19 @@
 #%%
 from pathlib import Path
 import yaml
-import pandas as pd
 import json
 
+from src.loaders import load_evidence
+from src.process import study_year
+from src.profiling import stage, write_report
+
 from functions import (
     validator,
     plot_all_designs,
     plot_all_categories,
     plot_all_responses,
-    create_ids_save
+    create_ids_save,
+    rejection_label_counts
 )
 
 home = Path.home()
@@ -28,12 +32,18 @@ country_iso_url = params["country_codes_url"]
 headers = params["headers"]
 
 # %%
-evidence_data = pd.read_csv(evidence_path)
-evidence_data["study_year"] = evidence_data["study_date"].apply(lambda x: pd.to_datetime(x).year if len(x.split("-")) >= 2 else x)
+## stages are timed when ESSA_PROFILE is set (see src/profiling.py)
+with stage("load") as record:
+    evidence_data = load_evidence(evidence_path)
+    evidence_data["study_year"] = study_year(evidence_data["study_date"])
+    record["rows_out"] = evidence_data
 
 #%%
 ## validate some rejection cols which have similar values with their preceding columns
-validator(evidence_data) # we can comment it out if we don't want this level of detail/consistency
+with stage("validate", evidence_data) as record:
+    flags = validator(evidence_data) # we can comment it out if we don't want this level of detail/consistency
+    record["rows_out"] = flags
+flags["flag"].value_counts()
 
 # %%
 ## create labels to help with decongesting the x-axis labels
@@ -54,9 +64,20 @@ rj_cols = [
     'rejection_criterion_level_3',
     'rejection_criterion_level_4'
 ]
-plot_all_responses(evidence_data, label_dict, label_dict_, rj_cols)
+## count every response per design category and level once; all the charts below read from it
+with stage("count-rejections", evidence_data) as record:
+    rejection_counts = rejection_label_counts(evidence_data, label_dict, rj_cols)
+    record["rows_out"] = rejection_counts
+
+with stage("plot-responses", rejection_counts):
+    plot_all_responses(evidence_data, label_dict, label_dict_, rj_cols, counts=rejection_counts)
 
 # %%
-plot_all_categories(evidence_data, label_dict, rj_cols)
+with stage("plot-categories", rejection_counts):
+    plot_all_categories(evidence_data, label_dict, rj_cols, counts=rejection_counts)
 
-plot_all_designs(evidence_data, label_dict, rj_cols)
\ No newline at end of file
+with stage("plot-designs", rejection_counts):
+    plot_all_designs(evidence_data, label_dict, rj_cols, counts=rejection_counts)
+
+# %%
+write_report()
\ No newline at end of file
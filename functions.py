@@ -1,10 +1,24 @@
+import json
+import hashlib
+from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-import matplotlib.pyplot as plt
+
+from src.cache import file_fingerprint, cache_file
+from src.process import build_long_table, long_dimension
+from src.matching import build_match_index, resolve_countries
+from src.cube import cube_counts, cube_tier_totals
+
+# matplotlib and geopandas take most of the import time, so they are imported in the
+# functions that draw: computing tables or counts does not load them
 
 def plot_tier_distribution(df, total_products, save_path=None):
+    import matplotlib.pyplot as plt
     # Count unique products in each tier
     tier_counts = (
-        df.groupby("validation_number")["product_id"]
+        df.groupby("validation_number", observed=True)["product_id"]
         .nunique()
         .reset_index(name="count")
     )
@@ -49,6 +63,21 @@ def country_to_region(row, region_data_dict):
     regions = [region_data_dict[c] for c in countries if c in region_data_dict]
     return ",".join(regions) if regions else None
 
+## distinct studies per (tier, value) and per tier, shared by the distribution charts
+def _tier_counts(df, col, tier_col, long_df=None, cube=None, **long_kwargs):
+    """
+    ([tier_col, col, count] frame, count per tier) of distinct studies, rolled
+    up from the cube if given (see src/cube.py), otherwise from the long
+    table, which is built from df when long_df is not given.
+    """
+    if cube is not None:
+        return cube_counts(cube, col, tier_col), cube_tier_totals(cube, col, tier_col)
+    if long_df is None:
+        long_df = build_long_table(df, [col], tier_col=tier_col, **long_kwargs)
+    df = long_dimension(long_df, col, tier_col)
+    counts = df.groupby([tier_col, col])["study_id"].nunique().reset_index(name="count")
+    return counts, df.groupby(tier_col)["study_id"].nunique()
+
 def plot_country_distribution_by_tier(
     df,
     country_col="country_of_study",
@@ -57,25 +86,15 @@ def plot_country_distribution_by_tier(
     top_n=15,
     figsize=(12,6),
     cmap="tab20",
-    save_path = None
+    save_path = None,
+    long_df=None,
+    cube=None
 ):
-    # Drop actual NaN values first
-    df = df.dropna(subset=[country_col]).copy()
-    
-    # Split and explode
-    df[country_col] = df[country_col].astype(str).str.split(",")
-    df = df.explode(country_col)
-    df[country_col] = df[country_col].str.strip()
-    
-    # Drop leftover invalid entries ("", "nan", None)
-    df = df[df[country_col].notna() & (df[country_col] != "") & (df[country_col].str.lower() != "nan")]
-    
-    # Count products per (tier, country)
-    tier_country_counts = (
-        df.groupby([tier_col, country_col])["study_id"]
-        .nunique()
-        .reset_index(name="count")
-    )
+    import matplotlib.pyplot as plt
+
+    # Count studies per (tier, country) and per tier; pass cube (or long_df) to reuse
+    # aggregates built once for all charts
+    tier_country_counts, n_per_tier = _tier_counts(df, country_col, tier_col, long_df, cube)
     
     # Tier totals + percentages
     tier_country_counts["tier_total"] = (
@@ -112,12 +131,7 @@ def plot_country_distribution_by_tier(
     plt.xticks(rotation=0, ha="center")
 
     # ---- Add n=... labels here ----
-    tier_totals = (
-        df.groupby(tier_col)["study_id"]
-        .nunique()
-        .reindex(pivot_data.index)
-        .reset_index(name="count")
-    )
+    tier_totals = n_per_tier.reindex(pivot_data.index).reset_index(name="count")
 
     # Loop over each tier (bar) by index
     for i, (tier, n) in enumerate(zip(tier_totals[tier_col], tier_totals["count"])):
@@ -144,23 +158,15 @@ def plot_region_distribution_by_tier(
     product_col="product_id",
     figsize=(10,6),
     cmap="tab20",
-    save_path=None  # <- optional: path to save file
+    save_path=None,  # <- optional: path to save file
+    long_df=None,
+    cube=None
 ):
-    df = df.assign(**{region_col: df[region_col].astype(str).str.split(",")})
-    df = df.explode(region_col)
-    df[region_col] = df[region_col].str.strip()
-    df = df[
-        df[region_col].notna()
-        & (df[region_col] != "")
-        & (df[region_col].str.lower() != "nan")
-        & (df["country_of_study"].notna())
-    ]
+    import matplotlib.pyplot as plt
 
-    tier_region_counts = (
-        df.groupby([tier_col, region_col])["study_id"]
-        .nunique()
-        .reset_index(name="count")
-    )
+    # Count studies per (tier, region) and per tier; pass cube (or long_df) to reuse
+    # aggregates built once for all charts
+    tier_region_counts, n_per_tier = _tier_counts(df, region_col, tier_col, long_df, cube)
 
     tier_region_counts["tier_total"] = (
         tier_region_counts.groupby(tier_col)["count"].transform("sum")
@@ -182,12 +188,7 @@ def plot_region_distribution_by_tier(
     plt.xticks(rotation=0, ha="center")
 
     # ---- Add n=... labels here ----
-    tier_totals = (
-        df.groupby(tier_col)["study_id"]
-        .nunique()
-        .reindex(pivot_region.index)
-        .reset_index(name="count")
-    )
+    tier_totals = n_per_tier.reindex(pivot_region.index).reset_index(name="count")
 
     # Loop over each tier (bar) by index
     for i, (tier, n) in enumerate(zip(tier_totals[tier_col], tier_totals["count"])):
@@ -216,30 +217,16 @@ def plot_studyyear_distribution_by_tier(
     product_col="product_id",
     figsize=(12,6),
     cmap="tab20",
-    save_path=None
+    save_path=None,
+    long_df=None,
+    cube=None
 ):
-    # Expand multi-year cells
-    df = df.assign(**{year_col: df[year_col].astype(str).str.split(",")})
-    df = df.explode(year_col)
-    df[year_col] = df[year_col].str.strip()
-
-    # Drop blanks/NaNs/"nan"
-    df = df[
-        df[year_col].notna()
-        & (df[year_col] != "")
-        & (df[year_col].str.lower() != "nan")
-    ]
+    import matplotlib.pyplot as plt
 
-    # Convert to numeric
-    df[year_col] = pd.to_numeric(df[year_col], errors="coerce")
-    df = df.dropna(subset=[year_col])
-    df[year_col] = df[year_col].astype(int)
-
-    # Count products per tier/year
-    tier_year_counts = (
-        df.groupby([tier_col, year_col])["study_id"]
-        .nunique()
-        .reset_index(name="count")
+    # Count studies per (tier, year) and per tier, multi-year studies counting in each
+    # of their years; pass cube (or long_df) to reuse aggregates built once for all charts
+    tier_year_counts, n_per_tier = _tier_counts(
+        df, year_col, tier_col, long_df, cube, year_dimensions=[year_col]
     )
 
     # Compute percentages
@@ -265,12 +252,7 @@ def plot_studyyear_distribution_by_tier(
     plt.xticks(rotation=0, ha="center")
 
     # ---- Add n=... labels here ----
-    tier_totals = (
-        df.groupby(tier_col)["study_id"]
-        .nunique()
-        .reindex(pivot_year.index)
-        .reset_index(name="count")
-    )
+    tier_totals = n_per_tier.reindex(pivot_year.index).reset_index(name="count")
 
     # Loop over each tier (bar) by index
     for i, (tier, n) in enumerate(zip(tier_totals[tier_col], tier_totals["count"])):
@@ -290,64 +272,303 @@ def plot_studyyear_distribution_by_tier(
 
     return pivot_year
 
+## world geometry, converted from the shapefile once and memoized
+WORLD_COLUMNS = ("SUBUNIT",)
+
+@lru_cache(maxsize=4)
+def _load_world(shapefile_path, fingerprint, columns):
+    columns_key = hashlib.sha1(json.dumps(columns).encode()).hexdigest()[:8]  # each column set has an entry of its own
+    cached = cache_file(f"world-{Path(shapefile_path).stem}-{columns_key}", fingerprint)
+    if cached.exists():
+        return pd.read_pickle(cached)
+    import geopandas as gpd
+    world = gpd.read_file(shapefile_path, columns=list(columns))[[*columns, "geometry"]]
+    world.to_pickle(cached)
+    return world
+
+def load_world(shapefile_path, columns=WORLD_COLUMNS):
+    """
+    Natural Earth countries with only the given columns and their geometry.
+    The shapefile is parsed once into a pickle under data/cache, keyed by the
+    size and mtime of its files, and kept in memory for repeated renders.
+    """
+    shapefile_path = Path(shapefile_path)
+    parts = sorted(shapefile_path.parent.glob(f"{shapefile_path.stem}.*"))
+    fingerprint = file_fingerprint(*parts)
+    return _load_world(str(shapefile_path), fingerprint, tuple(columns)).copy()
+
+# country names that differ from the map's SUBUNIT names
+WORLD_NAMES = {
+    "Côte d'Ivoire": "Ivory Coast",
+    "Democratic Republic of Congo": "Democratic Republic of the Congo",
+    "Eswatini": "eSwatini",
+    "HK": "China",
+    "NA":"Namibia",
+    "PR":"Puerto Rico",
+    "People's Republic of China": "China",
+    "Republic of China (Taiwan)" : "Taiwan",
+    "The Gambia": "Gambia",
+    "XK": "Kosovo"
+}
+
+def world_country_names(countries, world, fuzzy=False, cache_dir=None) -> pd.Series:
+    """
+    The countries (a Series) as the map's SUBUNIT names: through WORLD_NAMES
+    and, with fuzzy, names still unmatched are matched to the map's own, with
+    the matches remembered under cache_dir if given.
+    """
+    countries = countries.replace(WORLD_NAMES)
+    subunits = world["SUBUNIT"].dropna()
+    unmatched = ~countries.isin(subunits)
+    if fuzzy and unmatched.any():
+        index = build_match_index(dict(zip(subunits, subunits)))
+        resolved = resolve_countries(countries[unmatched], index, cache_name="world", cache_dir=cache_dir)
+        countries[unmatched] = resolved.where(resolved.notna(), countries[unmatched])
+    return countries
+
+## choropleth of the number of studies per country
+def plot_study_distribution_by_country_geopandas(
+    df,
+    country_col="country_of_study",
+    figsize=(12, 6),
+    cmap="plasma",
+    save_path=None,
+    shapefile_path="data/ne_110m_admin_0_countries/ne_110m_admin_0_countries.shp",  # Update with your path
+    label = "all",
+    long_df=None,
+    world=None,
+    show=True,
+    fuzzy=False,
+    cache_dir=None
+):
+    import matplotlib.pyplot as plt
+
+    # Step 1-2: one row per (study, country), blanks/NaNs/"nan" dropped;
+    # pass long_df to reuse a table built once for all maps
+    if long_df is None:
+        long_df = build_long_table(df, [country_col])
+    df = long_dimension(long_df, country_col)
+
+    # Load world map from local shapefile (pass world to reuse one already loaded)
+    if world is None:
+        world = load_world(shapefile_path)
+
+    # Step 3: Standardize country names (see world_country_names)
+    df[country_col] = world_country_names(df[country_col], world, fuzzy, cache_dir)
+
+    # study counts per country (unique products)
+    agg_df = (
+        df.groupby(country_col)["study_id"]
+        .nunique()
+        .reset_index(name="study_count")
+    )
+
+    # Compute percentages
+    total_studies = agg_df["study_count"].sum()
+    agg_df["percentage"] = (agg_df["study_count"] / total_studies * 100).round(1)
+
+    # Merge study counts with world map
+    world = world.merge(agg_df, how='left', left_on='SUBUNIT', right_on=country_col)
+    # Fill NaN values (countries with no studies) with 0
+    world['study_count'] = world['study_count'].fillna(0)
+    world['percentage'] = world['percentage'].fillna(0)
+
+    # Plot choropleth map
+    fig, ax = plt.subplots(1, 1, figsize=figsize)
+    world.plot(
+        column='study_count',
+        ax=ax,
+        cmap=cmap,
+        legend=True,
+        legend_kwds={
+            'label': "Number of Studies",
+            'orientation': "horizontal",
+            'shrink': 0.6,
+            'pad': 0.05
+        },
+        missing_kwds={
+            'color': 'lightgrey',
+            'label': 'No Data'
+        }
+    )
+    ax.set_title(f"Geographical Distribution of {label} Studies (Total n={total_studies})", pad=20)
+    ax.axis('off')
+
+    # Step 8: Save and show
+    if save_path:
+        plt.savefig(save_path, dpi=300, bbox_inches="tight")
+
+    if show:
+        plt.show()
+
+    return fig, world
+
+## per-tier maps rendered headlessly across a process pool
+STUDY_MAPS = [
+    # (file name, label, tiers to keep, or {"exclude": tiers} to keep all others; None keeps all)
+    ("study_distribution_all.png", "all", None),
+    # every tier but 5, so unlabelled tiers ("Tier-nan") stay in, as in the original script
+    ("study_distribution_essa_eligible.png", "ESSA-Eligible", {"exclude": ["Tier-5"]}),
+    ("study_distribution_essa_lvl_1.png", "ESSA level 1", ["Tier-1"]),
+    ("study_distribution_essa_lvl_2.png", "ESSA level 2", ["Tier-2"]),
+    ("study_distribution_essa_lvl_3.png", "ESSA level 3", ["Tier-3"]),
+    ("study_distribution_essa_lvl_4.png", "ESSA level 4", ["Tier-4"]),
+]
+
+_world = None
+
+def _map_rows(long_df, tiers):
+    """Rows of long_df for the tiers of a STUDY_MAPS entry."""
+    if tiers is None:
+        return long_df
+    if isinstance(tiers, dict):
+        return long_df[~long_df["tier"].isin(tiers["exclude"])]
+    return long_df[long_df["tier"].isin(tiers)]
+
+def _init_map_worker(world):
+    global _world
+    import matplotlib.pyplot as plt
+    plt.switch_backend("Agg")
+    _world = world
+
+def _render_map(long_df, save_path, label):
+    import matplotlib.pyplot as plt
+    fig, _ = plot_study_distribution_by_country_geopandas(
+        None, long_df=long_df, world=_world, save_path=save_path, label=label, show=False
+    )
+    plt.close(fig)
+    return save_path
+
+def render_study_maps(
+    df,
+    out_dir="data/charts",
+    shapefile_path="data/ne_110m_admin_0_countries/ne_110m_admin_0_countries.shp",
+    long_df=None,
+    maps=STUDY_MAPS,
+    max_workers=None,
+    fuzzy=False,
+    cache_dir=None
+):
+    """
+    Render the per-tier study maps to PNGs in out_dir without displaying them.
+    The world geometry is read once and handed to each worker process, which
+    draws with the Agg backend. Expects tiers labelled "Tier-N". Returns the
+    written paths. Country names are matched to the map here, once, so the
+    workers never fuzzy-match or write to cache_dir (see world_country_names).
+    """
+    if long_df is None:
+        long_df = build_long_table(df, ["country_of_study"])
+    long_df = long_df[long_df["dimension"] == "country_of_study"]
+    world = load_world(shapefile_path)
+    long_df = long_df.assign(value=world_country_names(long_df["value"], world, fuzzy, cache_dir))
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers, initializer=_init_map_worker, initargs=(world,)) as pool:
+        futures = [
+            pool.submit(
+                _render_map,
+                _map_rows(long_df, tiers),
+                str(Path(out_dir) / file_name),
+                label,
+            )
+            for file_name, label, tiers in maps
+        ]
+        return [future.result() for future in futures]
+
 ## this function will validate some of the columns left blank but share same criterion as the previous question
 def validator(df):
-    for i,row in df.iterrows():
-        rej_keys = [key for key in row.keys() if "rejection_criterion" in key]
-        validation_num = row["validation_number"]
-        if validation_num == 1:
-            if not all(pd.isna(row[rej_key]) for rej_key in rej_keys):
-                print("Flag-0")
-        elif validation_num == 2:
-            if pd.isna(row[rej_keys[0]]):
-                print("Flag-1-0")
-            # if pd.isna(row[rej_keys[1]]):
-            #     print("Flag-1-1")
-            #     row[rej_keys[1]] = row[rej_keys[0]]
-        elif validation_num == 3:
-            if pd.isna(row[rej_keys[0]]):
-                print("Flag-2-0")
-            if pd.isna(row[rej_keys[1]]):
-                print("Flag-2-1")
-                df.loc[i, rej_keys[1]] = row[rej_keys[0]]
-                
-            # if pd.isna(row[rej_keys[2]]):
-            #     print("Flag-2-2")
-            #     row[rej_keys[2]] = row[rej_keys[1]]
-        elif validation_num == 4:
-            if pd.isna(row[rej_keys[0]]):
-                print("Flag-3-0")
-            if pd.isna(row[rej_keys[0]]):
-                print("Flag-3-1")
-                df.loc[i, rej_keys[1]] = row[rej_keys[0]]
-            if pd.isna(row[rej_keys[2]]):
-                print("Flag-3-2")
-                df.loc[i, rej_keys[2]] = row[rej_keys[1]]
-            # if pd.isna(row[rej_keys[3]]):
-            #     print("Flag-3-3")
-            #     row[rej_keys[3]] = row[rej_keys[2]]
+    """
+    Fill rejection criteria left blank that share the criterion of the previous
+    level, tier by tier, and return the inconsistencies found as a DataFrame with
+    one (row, flag, column) record per flag, in row order.
+    """
+    rej_keys = [key for key in df.columns if "rejection_criterion" in key]
+    validation_num = df["validation_number"]
+    original = df[rej_keys].copy()  # checks and fills read the values before any fill
+    missing = original.isna()
+
+    flags = []
+    def flag(mask, code, column):
+        mask = mask.to_numpy()
+        columns = column[mask] if isinstance(column, pd.Series) else column
+        flags.append(pd.DataFrame({
+            "position": mask.nonzero()[0],
+            "order": len(flags),
+            "row": df.index[mask],
+            "flag": code,
+            "column": columns,
+        }))
+
+    tier_1 = validation_num == 1
+    tier_2 = validation_num == 2
+    tier_3 = validation_num == 3
+    tier_4 = validation_num == 4
+
+    flag(tier_1 & ~missing.all(axis=1), "Flag-0", (~missing).idxmax(axis=1))
+    flag(tier_2 & missing[rej_keys[0]], "Flag-1-0", rej_keys[0])
+
+    flag(tier_3 & missing[rej_keys[0]], "Flag-2-0", rej_keys[0])
+    fill = tier_3 & missing[rej_keys[1]]
+    flag(fill, "Flag-2-1", rej_keys[1])
+    df[rej_keys[1]] = df[rej_keys[1]].mask(fill, original[rej_keys[0]])
+
+    if len(rej_keys) > 2:
+        flag(tier_4 & missing[rej_keys[0]], "Flag-3-0", rej_keys[0])
+        # level 1 is re-checked here (not level 2), so level 2 is only overwritten when level 1 is blank
+        fill = tier_4 & missing[rej_keys[0]]
+        flag(fill, "Flag-3-1", rej_keys[1])
+        df[rej_keys[1]] = df[rej_keys[1]].mask(fill, original[rej_keys[0]])
+        fill = tier_4 & missing[rej_keys[2]]
+        flag(fill, "Flag-3-2", rej_keys[2])
+        df[rej_keys[2]] = df[rej_keys[2]].mask(fill, original[rej_keys[1]])
+
+    return (
+        pd.concat(flags, ignore_index=True)
+        .sort_values(["position", "order"], kind="stable")
+        .reset_index(drop=True)[["row", "flag", "column"]]
+    )
+
+## counts of every rejection-criterion response, per design category and level, in one pass
+def rejection_label_counts(df, label_dict, cols, design_col="design_categorization_number"):
+    """
+    Melt the rejection criteria columns once and count the responses as one
+    (design, level, label, count) row per combination. level is the 1-based
+    position of the column in cols; responses missing from label_dict keep
+    their own value as label. Rows without a design category are kept.
+    """
+    melted = df[[design_col] + list(cols)].melt(
+        id_vars=design_col, value_vars=cols, var_name="level", value_name="response"
+    ).dropna(subset=["response"])
+
+    labels = melted["response"].map(label_dict)
+    melted["label"] = labels.where(labels.notna(), melted["response"]).astype(object)
+    melted["level"] = melted["level"].map({col: i for i, col in enumerate(cols, start=1)})
+
+    return (
+        melted.groupby([design_col, "level", "label"], dropna=False, observed=True)
+        .size()
+        .reset_index(name="count")
+    )
+
+def _label_sort_key(label):
+    # Sort the labels by numeric value: R1,R2,R3..... then any unlabelled responses
+    return (0, int(label[1:]), "") if label[1:].isdigit() else (1, 0, str(label))
+
+def _sorted_label_counts(counts):
+    """Sum the counts per label into a {label: count} dict sorted by label."""
+    totals = counts.groupby("label")["count"].sum()
+    return {k: int(v) for k, v in sorted(totals.items(), key=lambda item: _label_sort_key(item[0]))}
 
 ## function to plot the rejection criterion levels across the design categories: 
-def plot_rejection_criteria(df, label_dict, cols, d_label, ax):
-    # Filter the df by the specified design number
-    df_filtered = df[df["design_categorization_number"] == d_label].copy()
+def plot_rejection_criteria(df, label_dict, cols, d_label, ax, counts=None):
+    # Counts for the specified design number (pass counts to reuse a table computed once)
+    if counts is None:
+        counts = rejection_label_counts(df, label_dict, cols)
+    design_counts = counts[counts["design_categorization_number"] == d_label]
 
-    # Iterate through the rejection criteria columns
+    # Iterate through the rejection criteria levels
     for i, col in enumerate(cols, start=1):
-        new_labels = {}
-        # Count the number of non-null responses for each rejection criterion level
-        for _, row in df_filtered.iterrows():
-            row_val = row[col]
-            if pd.isna(row_val):
-                continue
-            else:
-                response = label_dict.get(row_val, row_val)  # Default to row_val if label_dict doesn't have the key
-                if response not in new_labels:
-                    new_labels[response] = 0
-                new_labels[response] += 1
-
-        # Sort the labels by numeric value: R1,R2,R3.....
-        labels_sort = {k: v for k, v in sorted(new_labels.items(), key=lambda item: int(item[0][1:]) if item[0][1:].isdigit() else item[0])}
+        labels_sort = _sorted_label_counts(design_counts[design_counts["level"] == i])
         labels = list(labels_sort.keys())
         values = list(labels_sort.values())
         
@@ -359,37 +580,27 @@ def plot_rejection_criteria(df, label_dict, cols, d_label, ax):
         ax[i-1].set_xticks(range(len(labels))) 
         ax[i-1].set_xticklabels(labels, rotation=45, ha="right")
 
-def plot_all_designs(df, label_dict, cols):
+def plot_all_designs(df, label_dict, cols, counts=None):
+    import matplotlib.pyplot as plt
     # Create a grid of subplots: 5 design categories, each with 4 subplots for the rejection criteria
     fig, axes = plt.subplots(5, 4, figsize=(20, 25)) 
+    if counts is None:
+        counts = rejection_label_counts(df, label_dict, cols)
     
     # Plot for each design categorization label (1 to 5)
     for d_label in range(1, 6):
-        plot_rejection_criteria(df, label_dict, cols, d_label, axes[d_label - 1])
+        plot_rejection_criteria(df, label_dict, cols, d_label, axes[d_label - 1], counts=counts)
     
     # Adjust layout to prevent overlapping
     plt.tight_layout()
     plt.show()
 
 ## function to plot the total responses' count across the design categories:
-def plot_by_category(df, label_dict, cols, d_label, ax):
-    # Filter the dataframe for the given design categorization number
-    df = df[df["design_categorization_number"] == d_label].copy()
-    
-    new_labels = {}
-    for i, row in df.iterrows():
-        for col in cols:
-            row_val = row[col]
-            if pd.isna(row_val):
-                continue
-            else:
-                response = label_dict[row_val]
-                if response not in new_labels:
-                    new_labels[response] = 0
-                new_labels[response] += 1
-    
-    # Sort the labels by numeric value in the label
-    labels_sort = {k: v for k, v in sorted(new_labels.items(), key=lambda item: int(item[0][1:]))}
+def plot_by_category(df, label_dict, cols, d_label, ax, counts=None):
+    # Counts for the given design categorization number, summed over the levels
+    if counts is None:
+        counts = rejection_label_counts(df, label_dict, cols)
+    labels_sort = _sorted_label_counts(counts[counts["design_categorization_number"] == d_label])
     labels = list(labels_sort.keys())
     values = list(labels_sort.values())
 
@@ -401,34 +612,28 @@ def plot_by_category(df, label_dict, cols, d_label, ax):
     ax.set_xticks(range(len(labels)))
     ax.set_xticklabels(labels, rotation=45, ha="right")  # Rotate the labels for better visibility
 
-def plot_all_categories(df, label_dict, cols):
-    
+def plot_all_categories(df, label_dict, cols, counts=None):
+    import matplotlib.pyplot as plt
+
     fig, axes = plt.subplots(1, 5, figsize=(20, 5))
+    if counts is None:
+        counts = rejection_label_counts(df, label_dict, cols)
     
     # Plot for each design categorization label
     for d_label, ax in zip(range(1, 6), axes):
-        plot_by_category(df, label_dict, cols, d_label, ax)
+        plot_by_category(df, label_dict, cols, d_label, ax, counts=counts)
     
     # Adjust layout to prevent overlapping
     plt.tight_layout()
     plt.show()
 
 # plot all the responses
-def plot_all_responses(df, label_dict, label_dict_,cols):
-    labels = list(label_dict.values())
-    new_labels = {}
-    for i,row in df.iterrows():
-        for col in cols:
-            row_val = row[col]
-            if pd.isna(row_val):
-                continue
-            else:
-                response = label_dict[row_val]
-                if response not in new_labels:
-                    new_labels[response] = 0
-                new_labels[response] += 1
-    
-    labels_sort = {k:v for k,v in sorted(new_labels.items(), key=lambda item: int(item[0][1:]))}
+def plot_all_responses(df, label_dict, label_dict_,cols, counts=None):
+    import matplotlib.pyplot as plt
+    # Counts over all design categories and levels
+    if counts is None:
+        counts = rejection_label_counts(df, label_dict, cols)
+    labels_sort = _sorted_label_counts(counts)
     labels = list(labels_sort.keys())
     values = list(labels_sort.values())
 
@@ -0,0 +1,39 @@
+"""
+Render the per-tier study distribution maps to data/charts without opening
+any window, for scheduled report generation.
+
+    python render_maps.py [--workers N] [--incremental]
+"""
+import argparse
+
+from src.pipeline import load_params, prepare_evidence
+from src.cache import CACHE_DIR
+from functions import render_study_maps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the study distribution maps headlessly.")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--out-dir", default="data/charts")
+    parser.add_argument("--shapefile", default="data/ne_110m_admin_0_countries/ne_110m_admin_0_countries.shp")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--incremental", action="store_true", help="only normalize rows changed since the last incremental run")
+    args = parser.parse_args()
+
+    evidence_data = prepare_evidence(load_params(args.config), incremental=args.incremental)
+    evidence_data["validation_number"] = "Tier-"+evidence_data["validation_number"].astype(str)
+
+    for path in render_study_maps(
+        evidence_data,
+        out_dir=args.out_dir,
+        shapefile_path=args.shapefile,
+        max_workers=args.workers,
+        fuzzy=True,
+        cache_dir=CACHE_DIR
+    ):
+        print(path)
+
+
+# the pool's worker processes import this module, so nothing runs at import time
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+
+CACHE_DIR = Path("data/cache")
+# name -> file of its current entry, per cache directory
+MANIFEST = "manifest.json"
+
+def file_fingerprint(*paths, content=False) -> str:
+    """
+    Short digest identifying the current state of the given files: their size
+    and modification time, or their bytes when content is True.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        path = Path(path)
+        digest.update(path.name.encode())
+        if content:
+            with open(path, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+        else:
+            stat = path.stat()
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+def content_fingerprint(path, cache_dir=CACHE_DIR) -> str:
+    """
+    file_fingerprint(path, content=True), with the bytes only read again when
+    the size or modification time of the file changed: the digest is kept in
+    cache_dir under its size/mtime fingerprint.
+    """
+    path = Path(path)
+    name = f"content-{path.stem}-{hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:8]}"
+    remembered = cache_file(name, file_fingerprint(path), suffix=".txt", cache_dir=cache_dir)
+    if remembered.exists():
+        return remembered.read_text()
+    digest = file_fingerprint(path, content=True)
+    remembered.write_text(digest)
+    return digest
+
+def cache_file(name: str, fingerprint: str, suffix=".pkl", cache_dir=CACHE_DIR) -> Path:
+    """
+    Path of the cache entry for name at the given fingerprint. The manifest of
+    cache_dir records the entry of each exact name (and suffix); the entry it
+    held at another fingerprint is stale and gets removed. Entries of other
+    names are never touched, so anything that must coexist goes in the name.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / f"{name}-{fingerprint}{suffix}"
+
+    manifest = _read_manifest(cache_dir)
+    previous = manifest.get(name + suffix)
+    if previous != path.name:
+        if previous is not None:
+            (cache_dir / previous).unlink(missing_ok=True)
+        manifest[name + suffix] = path.name
+        _write_manifest(cache_dir, manifest)
+    return path
+
+def _read_manifest(cache_dir) -> dict:
+    try:
+        return json.loads((Path(cache_dir) / MANIFEST).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _write_manifest(cache_dir, manifest):
+    write_atomic(Path(cache_dir) / MANIFEST, json.dumps(manifest, indent=2, sort_keys=True))
+
+def write_atomic(path, text: str):
+    """Write text to path aside and rename it in place, so concurrent readers never see half a file."""
+    path = Path(path)
+    temp = path.with_name(f".{path.name}.{os.getpid()}")
+    temp.write_text(text, encoding="utf-8")
+    temp.replace(path)
@@ -0,0 +1,239 @@
+"""
+product-dashboard: the evidence pipeline as a DAG of cached stages,
+
+    load -> clean -> normalize -> region-map -> aggregate -> charts, maps, export
+                  \\-> rejections
+
+Each stage output is pickled under data/cache/stages, keyed on a hash of its
+inputs (the evidence csv's bytes, hashed again only when its size or mtime
+changed, the alias and region dicts, the options),
+of the project's code and of the keys of the stages it reads from. Stages
+whose key is unchanged are skipped, and their output is only loaded when a
+stage that has to run needs it.
+
+    product-dashboard [maps|charts|rejections|export|all ...] [--force]
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+import functions
+from src.cache import CACHE_DIR, file_fingerprint, content_fingerprint, cache_file
+from src.pipeline import load_params, load_regions, project_home
+from src.get_countries import load_country_aliases
+from src.loaders import load_evidence
+from src.process import study_year, normalize_countries, map_regions
+from src.cube import build_cube, cube_long
+from src.encoding import compact_columns
+from src.export import EXPORT_DIR, FORMATS, rejection_tables, write_export
+from src.profiling import stage as profile_stage, write_report
+
+STAGE_DIR = CACHE_DIR / "stages"
+STAGE_VERSION = 1
+TARGETS = ["charts", "maps", "rejections", "export"]
+TOTAL_PRODUCTS = 287
+
+## stages: each takes the run context and the outputs of the stages it reads from
+def _load(ctx):
+    return load_evidence(ctx["home"] / ctx["params"]["evidence_path"])
+
+def _clean(ctx, evidence_data):
+    evidence_data = evidence_data.copy()
+    evidence_data["study_year"] = study_year(evidence_data["study_date"])
+    functions.validator(evidence_data)
+    return evidence_data
+
+def _normalize(ctx, evidence_data):
+    return normalize_countries(
+        evidence_data.copy(), "country_of_study", _aliases(ctx), fuzzy=True, cache_dir=ctx["cache_dir"]
+    )
+
+def _region_map(ctx, evidence_data):
+    # downstream stages read the cells through the cube, so they are stored as categoricals
+    evidence_data = map_regions(evidence_data.copy(), "country_of_study", _regions(ctx))
+    return compact_columns(evidence_data, ["country_of_study", "region"])
+
+def _aggregate(ctx, evidence_data):
+    return build_cube(evidence_data, _regions(ctx))
+
+def _charts(ctx, evidence_data, cube):
+    import matplotlib.pyplot as plt
+
+    out_dir = Path(ctx["out_dir"])
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # tiers labelled as in evidence_analysis.py
+    label = lambda tier: f"ESSA-tier-{tier}" if tier < 5 else "Not eligible"
+    evidence_data = evidence_data.assign(validation_number=evidence_data["validation_number"].map(label))
+    cube = cube.assign(validation_number=cube["validation_number"].map(label))
+
+    paths = [out_dir / name for name in (
+        "tier_distribution.png", "country_distribution.png", "region_distribution.png", "studyyear_distribution.png"
+    )]
+    functions.plot_tier_distribution(evidence_data, ctx["total_products"], save_path=paths[0])
+    functions.plot_country_distribution_by_tier(evidence_data, top_n=15, save_path=paths[1], cube=cube)
+    functions.plot_region_distribution_by_tier(evidence_data, save_path=paths[2], cube=cube)
+    functions.plot_studyyear_distribution_by_tier(evidence_data, save_path=paths[3], cube=cube)
+    plt.close("all")
+    return [str(path) for path in paths]
+
+def _maps(ctx, cube):
+    long_df = cube_long(cube, "country_of_study")
+    long_df["tier"] = "Tier-" + long_df["tier"].astype(str)
+    return functions.render_study_maps(
+        None, ctx["out_dir"], ctx["shapefile"], long_df=long_df, max_workers=ctx["workers"],
+        fuzzy=True, cache_dir=ctx["cache_dir"]
+    )
+
+def _rejections(ctx, evidence_data):
+    import matplotlib.pyplot as plt
+
+    out_dir = Path(ctx["out_dir"])
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tables, label_dict = rejection_tables(evidence_data.copy(), validate=False)  # validated in clean
+    counts = tables["agg_rejection"]
+    label_dict_ = {code: label for label, code in label_dict.items()}
+    cols = [f"rejection_criterion_level_{level}" for level in range(1, 5)]
+
+    paths = [out_dir / name for name in ("rejection_responses.png", "rejection_categories.png", "rejection_designs.png")]
+    functions.plot_all_responses(evidence_data, label_dict, label_dict_, cols, counts=counts)
+    plt.savefig(paths[0], dpi=300, bbox_inches="tight")
+    functions.plot_all_categories(evidence_data, label_dict, cols, counts=counts)
+    plt.savefig(paths[1], dpi=300, bbox_inches="tight")
+    functions.plot_all_designs(evidence_data, label_dict, cols, counts=counts)
+    plt.savefig(paths[2], dpi=300, bbox_inches="tight")
+    plt.close("all")
+
+    with open(ctx["labels_path"], "w") as file:
+        json.dump(label_dict, file, indent=4)
+    return [str(path) for path in paths] + [str(ctx["labels_path"])]
+
+def _export(ctx, evidence_data, cube):
+    paths = write_export(evidence_data.copy(), cube, ctx["export_dir"], ctx["format"], validate=False)
+    return [str(path) for path in paths]
+
+## inputs outside the stages, loaded once per run
+def _aliases(ctx):
+    if "aliases" not in ctx:
+        params = ctx["params"]
+        ctx["aliases"] = load_country_aliases(params["wiki_countries_url"], params["country_codes_url"], params["headers"])
+    return ctx["aliases"]
+
+def _regions(ctx):
+    if "regions" not in ctx:
+        ctx["regions"] = load_regions(ctx["params"]["regions"])
+    return ctx["regions"]
+
+def _shapefile_parts(ctx):
+    shapefile = Path(ctx["shapefile"])
+    return sorted(shapefile.parent.glob(f"{shapefile.stem}.*"))
+
+STAGES = {
+    # name: (stages it reads from, its other inputs, function)
+    "load": ((), lambda ctx: content_fingerprint(ctx["home"] / ctx["params"]["evidence_path"], ctx["cache_dir"]), _load),
+    "clean": (("load",), lambda ctx: None, _clean),
+    "normalize": (("clean",), _aliases, _normalize),
+    "region-map": (("normalize",), _regions, _region_map),
+    "aggregate": (("region-map",), _regions, _aggregate),
+    "charts": (("region-map", "aggregate"), lambda ctx: [ctx["out_dir"], ctx["total_products"]], _charts),
+    "maps": (("aggregate",), lambda ctx: [ctx["out_dir"], file_fingerprint(*_shapefile_parts(ctx))], _maps),
+    "rejections": (("clean",), lambda ctx: [ctx["out_dir"], ctx["labels_path"]], _rejections),
+    "export": (("region-map", "aggregate"), lambda ctx: [ctx["export_dir"], ctx["format"]], _export),
+}
+
+def _code_fingerprint() -> str:
+    """Changes with any module of the project, so that stages re-run after code changes."""
+    return file_fingerprint(*sorted(Path(__file__).parent.glob("*.py")), functions.__file__)
+
+def stage_key(name, ctx, keys) -> str:
+    """Hash of the inputs of a stage and, recursively, of the stages it reads from."""
+    if name not in keys:
+        after, inputs, _ = STAGES[name]
+        payload = json.dumps(
+            [STAGE_VERSION, name, ctx["code"], inputs(ctx), [stage_key(stage, ctx, keys) for stage in after]],
+            sort_keys=True, default=str
+        )
+        keys[name] = hashlib.sha1(payload.encode()).hexdigest()[:16]
+    return keys[name]
+
+def _up_to_date(output) -> bool:
+    # the render stages return the files they wrote, which have to still be there
+    return not isinstance(output, list) or all(Path(path).exists() for path in output)
+
+def run_stage(name, ctx, keys, outputs, force=False, log=print):
+    """Output of a stage: the cached one if its key is unchanged, otherwise computed."""
+    if name in outputs:
+        return outputs[name]
+    after, _, run = STAGES[name]
+    path = cache_file(name, stage_key(name, ctx, keys), cache_dir=ctx["cache_dir"])
+
+    if path.exists() and not force:
+        output = pd.read_pickle(path)
+        if _up_to_date(output):
+            log(f"{name}: up to date")
+            outputs[name] = output
+            return output
+
+    upstream = [run_stage(stage, ctx, keys, outputs, force, log) for stage in after]
+    start = time.perf_counter()
+    with profile_stage(name, upstream[0] if upstream else None) as record:
+        output = run(ctx, *upstream)
+        record["rows_out"] = output if isinstance(output, pd.DataFrame) else None
+    pd.to_pickle(output, path)
+    log(f"{name}: done in {time.perf_counter() - start:.1f}s")
+    outputs[name] = output
+    return output
+
+def run_targets(targets, ctx, force=False, log=print) -> dict:
+    """Bring the given stages up to date; returns their outputs by name."""
+    ctx = {"code": _code_fingerprint(), "cache_dir": STAGE_DIR, **ctx}
+    keys, outputs = {}, {}
+    for target in targets:
+        run_stage(target, ctx, keys, outputs, force, log)
+    return {target: outputs[target] for target in targets}
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the product dashboard charts, maps and tables.")
+    parser.add_argument("targets", nargs="*", metavar="target", help=f"any of {', '.join(TARGETS)} or all (default)")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--out-dir", default="data/charts")
+    parser.add_argument("--export-dir", default=str(EXPORT_DIR))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv", help="format of the exported tables")
+    parser.add_argument("--shapefile", default="data/ne_110m_admin_0_countries/ne_110m_admin_0_countries.shp")
+    parser.add_argument("--workers", type=int, default=None, help="map worker processes (default: one per core)")
+    parser.add_argument("--total-products", type=int, default=TOTAL_PRODUCTS)
+    parser.add_argument("--force", action="store_true", help="re-run every stage, even the up-to-date ones")
+    args = parser.parse_args()
+
+    unknown = sorted(set(args.targets) - {*TARGETS, "all"})
+    if unknown:
+        parser.error(f"unknown target(s) {', '.join(unknown)}; choose from {', '.join(TARGETS)} or all")
+
+    # draw off-screen, unless a backend is asked for; pyplot is only imported by the render stages
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    targets = TARGETS if not args.targets or "all" in args.targets else list(dict.fromkeys(args.targets))
+    ctx = {
+        "params": load_params(args.config),
+        "home": project_home(),
+        "out_dir": args.out_dir,
+        "export_dir": args.export_dir,
+        "format": args.format,
+        "shapefile": args.shapefile,
+        "workers": args.workers,
+        "total_products": args.total_products,
+        "labels_path": "data/labels_map_dict.json",
+    }
+    for target, paths in run_targets(targets, ctx, args.force).items():
+        print(f"{target}:", *paths, sep="\n  ")
+
+    report = write_report()  # with ESSA_PROFILE set
+    if report:
+        print(f"profile: {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Aggregate cube of the normalized evidence: one row per distinct (tier,
+country, region, year, design, study) combination, the finest grain the
+charts slice by. Distinct-study counts do not add up across values (a
+multi-country study counts once per country), so the cube keeps the study
+ids and every chart count is a roll-up of it instead of a scan of the
+evidence rows.
+"""
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from src.cache import cache_file, file_fingerprint
+from src.process import explode_study_years, LONG_SOURCES
+from src.encoding import encode_cells, explode_encoded
+
+CUBE_VERSION = 2
+CUBE_DIMENSIONS = ["country_of_study", "region", "study_year", "design_categorization_number"]
+# columns of the evidence rows the cube is built from
+CUBE_SOURCES = ["study_id", "validation_number", "country_of_study", "study_date", "study_year", "design_categorization_number"]
+
+def build_cube(
+    df,
+    region_dict,
+    tier_col="validation_number",
+    id_col="study_id",
+    country_col="country_of_study",
+    region_col="region",
+    year_col="study_year",
+    design_col="design_categorization_number",
+) -> pd.DataFrame:
+    """
+    Distinct (study_id, tier, country, region, year, design) rows of the
+    normalized evidence rows df. Each country comes with its own region from
+    region_dict, and each study year is read from study_date when df has it,
+    as in the long table. Rows without a country or year keep them missing.
+    """
+    base = pd.DataFrame({
+        "row": np.arange(len(df)),
+        id_col: df[id_col].to_numpy(),
+        tier_col: df[tier_col].to_numpy(),
+        design_col: df[design_col].to_numpy() if design_col in df else None,
+    })
+
+    # regions are looked up once per distinct country, and both broadcast by code
+    encoded = encode_cells(df[country_col])
+    rows, codes = explode_encoded(encoded)
+    names = encoded["dictionary"].to_numpy(dtype=object)
+    regions = encoded["dictionary"].map(region_dict).to_numpy(dtype=object)
+    countries = pd.DataFrame({"row": rows, country_col: names[codes], region_col: regions[codes]})
+
+    source = LONG_SOURCES.get(year_col, year_col)
+    years = explode_study_years(df[source if source in df else year_col])
+    years = pd.DataFrame({"row": years.index.to_numpy(), year_col: years.to_numpy()})
+
+    cube = (
+        base.merge(countries, on="row", how="left")
+        .merge(years, on="row", how="left")
+        .drop(columns="row")
+        .drop_duplicates(ignore_index=True)
+    )
+    return cube.astype({country_col: "category", region_col: "category", year_col: "Int64"})
+
+def load_cube(
+    df, region_dict, source=None, country_dict=None, use_cache=True, cache_name="cube", **build_kwargs
+) -> pd.DataFrame:
+    """
+    build_cube through a pickle in data/cache, for df read from the evidence
+    csv source and normalized with country_dict. The key is the fingerprint
+    of source (size/mtime), the country and region dicts, the build kwargs
+    and the tier labels, which the scripts rewrite after loading; the rows
+    themselves are not hashed. Without source, the cube is built uncached.
+    """
+    if not use_cache or source is None:
+        return build_cube(df, region_dict, **build_kwargs)
+
+    tiers = df[build_kwargs.get("tier_col", "validation_number")]
+    labels = tiers.cat.categories if isinstance(tiers.dtype, pd.CategoricalDtype) else pd.unique(tiers)
+    payload = [CUBE_VERSION, file_fingerprint(source), country_dict, region_dict, build_kwargs, sorted(map(str, labels))]
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode())
+    cached = cache_file(cache_name, digest.hexdigest()[:16])
+    if cached.exists():
+        return pd.read_pickle(cached)
+
+    cube = build_cube(df, region_dict, **build_kwargs)
+    cube.to_pickle(cached)
+    return cube
+
+## queries: slices and roll-ups of the cube
+def slice_cube(cube, **filters) -> pd.DataFrame:
+    """Rows of the cube whose columns hold the given value, or one of the given values."""
+    mask = np.ones(len(cube), dtype=bool)
+    for col, value in filters.items():
+        values = [value] if isinstance(value, str) or not pd.api.types.is_list_like(value) else value
+        mask &= cube[col].isin(values).to_numpy()
+    return cube[mask]
+
+def _plain(values):
+    """Non-missing categorical or nullable integer values with the dtype the long table yields."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(values.cat.categories.dtype)
+    if isinstance(values.dtype, pd.Int64Dtype):
+        values = values.astype("int64")
+    return values
+
+def cube_counts(cube, dimension, tier_col="validation_number", id_col="study_id", **filters) -> pd.DataFrame:
+    """Distinct studies per (tier, value of dimension), as a [tier_col, dimension, count] frame."""
+    data = slice_cube(cube, **filters).dropna(subset=[dimension])
+    data = data[[tier_col, dimension, id_col]].drop_duplicates()
+    counts = data.groupby([tier_col, dimension], observed=True).size().reset_index(name="count")
+    counts[dimension] = _plain(counts[dimension])
+    return counts
+
+def cube_tier_totals(cube, dimension=None, tier_col="validation_number", id_col="study_id", **filters) -> pd.Series:
+    """Distinct studies per tier, among those with a value of dimension if given."""
+    data = slice_cube(cube, **filters)
+    if dimension is not None:
+        data = data.dropna(subset=[dimension])
+    return data[[tier_col, id_col]].drop_duplicates().groupby(tier_col, observed=True).size()
+
+def cube_long(cube, dimension, tier_col="validation_number", id_col="study_id", **filters) -> pd.DataFrame:
+    """
+    (study_id, tier, dimension, value) rows of one dimension, in the layout of
+    build_long_table, for the functions taking a long_df.
+    """
+    data = slice_cube(cube, **filters).dropna(subset=[dimension])
+    data = data[[id_col, tier_col, dimension]].drop_duplicates()
+    long_df = pd.DataFrame({
+        "study_id": data[id_col].to_numpy(),
+        "tier": data[tier_col].to_numpy(),
+        "dimension": dimension,
+        "value": _plain(data[dimension]).to_numpy(dtype=object),
+    })
+    long_df["dimension"] = long_df["dimension"].astype("category")
+    return long_df
@@ -0,0 +1,60 @@
+"""
+Compact encodings of the evidence columns. A comma-joined multi-valued
+column (country_of_study, region) becomes
+
+    cells       int32 per row: the distinct cell of the row, -1 if missing
+    offsets     int64 per distinct cell + 1: CSR offsets into values
+    values      int32: codes of the tokens of every distinct cell, in order
+    dictionary  pd.Index of the token behind each code
+
+so each row costs one integer, each distinct cell is split once, and
+group-bys run on the integer codes. Codes follow the order tokens are
+first seen in. build_cube, the long table and the chunked mode explode the
+countries through these encodings, and compact_columns keeps the cells of
+the stage outputs as categoricals.
+"""
+import numpy as np
+import pandas as pd
+
+def encode_cells(values, sep=",") -> dict:
+    """
+    Encode the sep-joined cells of values, dropping missing, blank and "nan"
+    tokens. Only the distinct cells are split.
+    """
+    cells, uniques = pd.factorize(values)  # missing cells get code -1
+    tokens = pd.Series(uniques, dtype=object).astype(str).str.split(sep).explode().str.strip()
+    tokens = tokens[tokens.notna() & (tokens != "") & (tokens.str.lower() != "nan")]
+
+    codes, dictionary = pd.factorize(tokens)
+    dictionary = pd.Index(dictionary, dtype=object)
+
+    lengths = np.bincount(tokens.index.to_numpy(dtype=np.int64), minlength=len(uniques))
+    return {
+        "cells": cells.astype(np.int32),
+        "offsets": np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+        "values": codes.astype(np.int32),
+        "dictionary": dictionary,
+    }
+
+def explode_encoded(encoded) -> tuple:
+    """(row position, value code) pairs of every token of every row, rows in order."""
+    cells, offsets = encoded["cells"], encoded["offsets"]
+    # code -1 (missing cell) picks the trailing zero length, which also covers columns with no cell at all
+    lengths = np.append(np.diff(offsets), 0)[cells]
+    starts = offsets[cells.clip(0, len(offsets) - 1)]
+
+    rows = np.repeat(np.arange(len(cells)), lengths)
+    first = np.repeat(np.cumsum(lengths) - lengths, lengths)  # position of each row's first pair
+    positions = np.repeat(starts, lengths) + np.arange(len(rows)) - first
+    return rows, encoded["values"][positions]
+
+def compact_columns(df, cols) -> pd.DataFrame:
+    """
+    Store the comma-joined cols of df as categoricals, in place: each distinct
+    cell once and an integer code per row, so copies and pickles of df stay
+    small. The cells read the same.
+    """
+    for col in cols:
+        if col in df and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
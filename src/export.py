@@ -0,0 +1,155 @@
+"""
+Tables for the Power BI dashboard: the normalized evidence as a small star
+schema (studies, countries, and the study-country and study-year bridges)
+plus the pre-aggregated counts the charts show, so the dashboard never has
+to load the raw evidence file.
+
+    python -m src.export [--out-dir data/powerbi] [--format csv|parquet] [--incremental]
+"""
+import json
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+from src.pipeline import load_params, load_regions, project_home, prepare_evidence, incremental_evidence
+from src.get_countries import load_country_aliases
+from src.incremental import count_tables
+from src.cube import CUBE_DIMENSIONS, load_cube, cube_counts, cube_tier_totals
+from functions import validator, create_ids_save, rejection_label_counts
+
+EXPORT_DIR = Path("data/powerbi")
+# file suffix per format; csv files are gzipped
+FORMATS = {"csv": ".csv.gz", "parquet": ".parquet"}
+# a study's rows can differ in all of these, so they go to the fact table and not to dim_study
+FACT_COLUMNS = ["study_id", "product_id", "validation_number", "design_categorization_number"]
+
+def star_schema(evidence_data, cube, tier_col="validation_number") -> dict:
+    """
+    dim_study (one row per study), fact_study_product (the distinct study,
+    product, tier and design combinations of the rows), dim_country
+    (country_key, country, region) and the bridge tables linking studies to
+    their countries and years.
+    """
+    facts = evidence_data[[col for col in FACT_COLUMNS if col in evidence_data]].drop_duplicates(ignore_index=True)
+    studies = pd.DataFrame({"study_id": facts["study_id"].drop_duplicates().sort_values().to_numpy()})
+
+    countries = (
+        cube[["country_of_study", "region"]].dropna(subset=["country_of_study"])
+        .drop_duplicates("country_of_study")
+        .sort_values("country_of_study", ignore_index=True)
+    )
+    countries.insert(0, "country_key", range(1, len(countries) + 1))
+    keys = dict(zip(countries["country_of_study"], countries["country_key"]))
+
+    study_countries = cube[["study_id", "country_of_study"]].dropna().drop_duplicates()
+    study_years = cube[["study_id", "study_year"]].dropna().drop_duplicates()
+    return {
+        "dim_study": studies,
+        "fact_study_product": facts,
+        "dim_country": countries,
+        "bridge_study_country": pd.DataFrame({
+            "study_id": study_countries["study_id"].to_numpy(),
+            "country_key": study_countries["country_of_study"].map(keys).to_numpy(),
+        }),
+        "bridge_study_year": study_years.reset_index(drop=True),
+    }
+
+def aggregate_tables(cube, tier_col="validation_number") -> dict:
+    """
+    Distinct studies per (tier, dimension, value) for every cube dimension,
+    and per tier, as the distribution charts count them.
+    """
+    counts = pd.concat([
+        cube_counts(cube, dimension, tier_col)
+        .rename(columns={dimension: "value"})
+        .assign(dimension=dimension)
+        for dimension in CUBE_DIMENSIONS
+    ], ignore_index=True)
+    counts["value"] = counts["value"].astype(str)
+    return {
+        "agg_tier_dimension": counts[[tier_col, "dimension", "value", "count"]],
+        "agg_tier": cube_tier_totals(cube, tier_col=tier_col).reset_index(name="count"),
+    }
+
+def rejection_tables(evidence_data, col="rejection_criterion_level", validate=True) -> tuple:
+    """
+    Rejection responses tallied per (design, level, label), the R-code of
+    every response, and the response -> R-code dict of labels_map_dict.json.
+    With validate, the blank levels are filled by validator first, as for the
+    rejection charts.
+    """
+    if validate:
+        validator(evidence_data)
+    label_dict = {label: f"R{i}" for i, label in enumerate(create_ids_save(evidence_data, col), start=1)}
+    cols = [f"{col}_{level}" for level in range(1, 5)]
+    tables = {
+        "agg_rejection": rejection_label_counts(evidence_data, label_dict, cols),
+        "dim_rejection_label": pd.DataFrame({"label": label_dict.values(), "response": label_dict.keys()}),
+    }
+    return tables, label_dict
+
+def write_tables(tables: dict, out_dir=EXPORT_DIR, fmt="csv") -> list:
+    """Write each table to out_dir as <name>.csv.gz or <name>.parquet; returns the paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name, table in tables.items():
+        path = out_dir / f"{name}{FORMATS[fmt]}"
+        if fmt == "parquet":
+            table.to_parquet(path, index=False)  # needs pyarrow or fastparquet
+        else:
+            table.to_csv(path, index=False, compression="gzip")
+        paths.append(path)
+    return paths
+
+def write_export(evidence_data, cube, out_dir=EXPORT_DIR, fmt="csv", validate=True, aggregates=None) -> list:
+    """
+    Write every dashboard table of the normalized evidence rows and their
+    cube; returns the paths. aggregates, if given, replace aggregate_tables(cube).
+    """
+    rejections, label_dict = rejection_tables(evidence_data, validate=validate)
+    aggregates = aggregate_tables(cube) if aggregates is None else aggregates
+    paths = write_tables(
+        {**star_schema(evidence_data, cube), **aggregates, **rejections}, out_dir, fmt
+    )
+    labels_path = Path(out_dir) / "labels_map_dict.json"
+    with open(labels_path, "w") as file:
+        json.dump(label_dict, file, indent=4)
+    return paths + [labels_path]
+
+def export_powerbi(params: dict, out_dir=EXPORT_DIR, fmt="csv", incremental=False, home=None) -> list:
+    """
+    Build every dashboard table from the evidence csv and write them; returns
+    the paths. With incremental, the aggregate tables are the counts kept up
+    to date by src/incremental.py.
+    """
+    aggregates = None
+    if incremental:
+        evidence_data, counts = incremental_evidence(params, home)
+        aggregates = count_tables(counts)
+    else:
+        evidence_data = prepare_evidence(params, home=home)
+    cube = load_cube(
+        evidence_data,
+        load_regions(params["regions"]),
+        source=(home or project_home()) / params["evidence_path"],
+        country_dict=load_country_aliases(params["wiki_countries_url"], params["country_codes_url"], params["headers"]),
+        cache_name="cube-export",
+    )
+    return write_export(evidence_data, cube, out_dir, fmt, aggregates=aggregates)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the Power BI tables of the evidence data.")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--out-dir", default=str(EXPORT_DIR))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--incremental", action="store_true", help="only normalize rows changed since the last incremental run")
+    args = parser.parse_args()
+
+    for path in export_powerbi(load_params(args.config), args.out_dir, args.format, args.incremental):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
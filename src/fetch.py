@@ -0,0 +1,96 @@
+"""
+Fetching of the reference-data pages (the Wikipedia country lists): one
+pooled requests.Session with timeouts and retries with backoff, and all
+pages of a refresh fetched at once. With a fixture directory (the
+fixture_dir argument or ESSA_FIXTURE_DIR) pages are read from
+<dir>/<fixture_name(url)> instead, for offline runs; a local HTTP stand-in
+only needs the urls in config.yaml pointed at it.
+"""
+import os
+import re
+from pathlib import Path
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+# requests is imported where a session is made, as the cached aliases are all most runs need
+
+FIXTURE_ENV = "ESSA_FIXTURE_DIR"
+TIMEOUT = (5, 30)  # seconds to connect, to read
+RETRIES = 3
+BACKOFF = 0.5  # retry waits grow as 0.5s, 1s, 2s, ...
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def make_session(headers: dict = None, retries=RETRIES, backoff=BACKOFF, pool_size=4):
+    """A requests.Session retrying failed GETs with backoff, keeping pool_size connections per host."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET"], respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(headers or {})
+    return session
+
+def fixture_name(url: str) -> str:
+    """File name of the fixture standing in for url, e.g. en.wikipedia.org_wiki_ISO_3166-1.html"""
+    parts = urlsplit(url)
+    return re.sub(r"[^\w.-]+", "_", f"{parts.netloc}{parts.path}").strip("_") + ".html"
+
+def fetch_page(url: str, headers: dict = None, validators: dict = None, session=None, timeout=TIMEOUT, fixture_dir=None):
+    """
+    GET url, sending the ETag/Last-Modified validators of a previous fetch.
+    Returns (html, validators); html is None when the server answers 304.
+    """
+    fixture_dir = fixture_dir or os.environ.get(FIXTURE_ENV)
+    if fixture_dir:
+        return (Path(fixture_dir) / fixture_name(url)).read_text(encoding="utf-8"), None
+
+    request_headers = dict(headers or {})
+    if validators:
+        if validators.get("etag"):
+            request_headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            request_headers["If-Modified-Since"] = validators["last_modified"]
+
+    own_session = session is None
+    if own_session:
+        session = make_session()
+    try:
+        response = session.get(url, headers=request_headers, timeout=timeout)
+    finally:
+        if own_session:
+            session.close()
+    if response.status_code == 304:
+        return None, validators
+    response.raise_for_status()
+
+    return response.text, {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+def fetch_pages(pages: dict, headers: dict = None, timeout=TIMEOUT, fixture_dir=None, session=None) -> dict:
+    """
+    Fetch pages ({name: (url, validators)}) concurrently over one session;
+    returns {name: (html, validators)} as fetch_page does. The first failure
+    is raised once all fetches are done.
+    """
+    own_session = session is None and not (fixture_dir or os.environ.get(FIXTURE_ENV))
+    if own_session:
+        session = make_session(headers, pool_size=max(len(pages), 1))
+    try:
+        with ThreadPoolExecutor(max_workers=max(len(pages), 1)) as pool:
+            futures = {
+                name: pool.submit(fetch_page, url, headers, validators, session, timeout, fixture_dir)
+                for name, (url, validators) in pages.items()
+            }
+        return {name: future.result() for name, future in futures.items()}
+    finally:
+        if own_session:
+            session.close()
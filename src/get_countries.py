@@ -1,8 +1,24 @@
 import re
-import requests
+import json
+import argparse
+import warnings
+from io import StringIO
+from datetime import datetime, timezone
+from pathlib import Path
+
 import pandas as pd
 import yaml
-from bs4 import BeautifulSoup as BSoup
+
+from src.fetch import fetch_page, fetch_pages
+
+# requests and lxml are imported where pages are fetched or parsed, as the cached
+# aliases are all most runs need
+
+ALIAS_CACHE_PATH = "data/country_aliases.json"
+ALIAS_CACHE_VERSION = 2
+ALIAS_CACHE_TTL_DAYS = 30
+# tables whose class list includes wikitable, as the css selector table.wikitable
+WIKITABLE_XPATH = "//table[contains(concat(' ', normalize-space(@class), ' '), ' wikitable ')]"
 
 def country_dict(row):
     iso = row["iso_3"]
@@ -18,71 +34,181 @@ def country_dict(row):
     
     return c_dict
 
-def retrieve_countries(URL: str, headers: dict) -> pd.DataFrame:
-    """Fetch and parse the Wikipedia page of country names and aliases."""
-    response = requests.get(URL, headers=headers)
-    
-    soup = BSoup(response.text, "lxml")
+def parse_countries(html: str):
+    """Parse the Wikipedia list of country names and aliases."""
+    import lxml.html
 
-    tables = soup.select("table.wikitable")
+    # only the rows of the wikitables are walked, skipping each table's header row
+    tables = lxml.html.fromstring(html).xpath(WIKITABLE_XPATH)
 
     country_list = []
+    full_dict = {}
     for table in tables:
-        table_rows = table.find_all("tr")
-        for row in table_rows[1:]:
-            row_contents = row.find_all("td")
-            alpha_code = row_contents[0].text.strip()
-            country = row_contents[1].find("a").text.strip()
-            alternatives = [c.text.strip() for c in row_contents[2].find_all("b")]
+        for row in table.xpath(".//tr")[1:]:
+            row_contents = row.xpath("./td")
+            alpha_code = row_contents[0].text_content().strip()
+            country = row_contents[1].xpath("(.//a)[1]")[0].text_content().strip()
+            alternatives = [c.text_content().strip() for c in row_contents[2].xpath(".//b")]
             country_list.append([alpha_code,country,alternatives])
 
-    country_list_df = pd.DataFrame(country_list)
-    country_list_df.columns = ["iso_3","Official name","Alternatives"]
+            # as country_dict, without a row Series per country
+            full_dict[alpha_code] = country
+            full_dict.update(dict.fromkeys(alternatives, country))
 
-    full_dict = {}
-    for r, row in country_list_df.iterrows():
-        full_dict.update(country_dict(row))
+    country_list_df = pd.DataFrame(country_list, columns=["iso_3","Official name","Alternatives"])
 
     return country_list_df, full_dict
 
-def country_iso_standards(url: str, headers: dict) -> pd.DataFrame:
-    # Fetch the page content
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()  # Raise error if request failed
+def retrieve_countries(URL: str, headers: dict, fixture_dir=None) -> pd.DataFrame:
+    """Fetch and parse the Wikipedia page of country names and aliases."""
+    html, _ = fetch_page(URL, headers, fixture_dir=fixture_dir)
+
+    return parse_countries(html)
 
-    # Parse all tables into a list of DataFrames
-    tables = pd.read_html(response.text)
-    df = tables[0]
+def parse_iso_standards(html: str) -> pd.DataFrame:
+    """Parse the ISO 3166 country codes table."""
+    import lxml.html
+
+    # Parse only the first table rather than all of them
+    table = lxml.html.fromstring(html).xpath("(//table[.//tr])[1]")[0]
+    # keep_default_na=False, or Namibia's ISO-2 code "NA" is read as missing
+    df = pd.read_html(StringIO(lxml.html.tostring(table, encoding="unicode")), keep_default_na=False)[0]
     cols = ["ISO name","Official name", "Sovereignty","ISO-2","ISO-3","Num","Subdivision codes","TLD"]
     df.columns = cols
-    new_rows = []
-    def clean_rows(row):
-        iso_name = row[cols[0]]
-        off_name = row[cols[1]]
-        iso_2 = row[cols[3]]
-        iso_3 = row[cols[4]]
-
-        if pd.notna(iso_name):
-            for x,nn in enumerate(iso_name):
-                if nn == "[":
-                    iso_name = iso_name[:x]
-        if pd.notna(off_name):
-            for x,nn in enumerate(off_name):
-                if nn == "[":
-                    off_name = off_name[:x]
-        if pd.notna(iso_2):
-            for x,nn in enumerate(iso_2):
-                if nn == "[":
-                    iso_2 = iso_2[:x]
-        if pd.notna(iso_3):
-            for x,nn in enumerate(iso_3):
-                if nn == "[":
-                    iso_3 = iso_3[:x]
-        
-        new_rows.append([iso_name, off_name, iso_2, iso_3])
-
-    for k,row in df.iterrows():
-        clean_rows(row)
-    countries_df = pd.DataFrame(new_rows)
+
+    # drop footnote marks, from the first "[" on
+    countries_df = df[[cols[0], cols[1], cols[3], cols[4]]].apply(
+        lambda col: col.str.replace(r"\[.*", "", regex=True, flags=re.S) if col.dtype == object else col
+    )
     countries_df.columns = ["iso_name","official_name","iso_2","iso_3"]
     return countries_df
+
+def country_iso_standards(url: str, headers: dict, fixture_dir=None) -> pd.DataFrame:
+    # Fetch the page content; raises if the request failed
+    html, _ = fetch_page(url, headers, fixture_dir=fixture_dir)
+
+    return parse_iso_standards(html)
+
+def build_alias_dict(country_list_df: pd.DataFrame, standard_countries: pd.DataFrame) -> dict:
+    """Map ISO-3 and ISO-2 codes to the official country names."""
+    country_list_df = country_list_df.copy()
+    country_list_df.loc[
+        country_list_df["Official name"] == "Kosovo", "iso_3"
+    ] = "XKX"
+    clean_countries = country_list_df[country_list_df["iso_3"] != '']
+    merged_countries = clean_countries.merge(standard_countries[["iso_2", "iso_3"]], on="iso_3")
+    alt_country_dict = merged_countries.set_index("iso_3")["Official name"].to_dict()
+    alt_country_dict.update(merged_countries.set_index("iso_2")["Official name"].to_dict())
+    # a missing code would be written to the json snapshot as "NaN" or "null"
+    return {code: name for code, name in alt_country_dict.items() if isinstance(code, str) and code.strip()}
+
+## on-disk alias cache, so that runs don't depend on Wikipedia being reachable
+def _records(df):
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def read_alias_cache(cache_path=ALIAS_CACHE_PATH):
+    """Return the cached alias snapshot, or None if missing or from another version."""
+    cache_path = Path(cache_path)
+    if not cache_path.exists():
+        return None
+    with open(cache_path, encoding="utf-8") as file:
+        cache = json.load(file)
+    if cache.get("version") != ALIAS_CACHE_VERSION:
+        return None
+    return cache
+
+def refresh_country_aliases(wiki_url: str, iso_url: str, headers: dict, cache_path=ALIAS_CACHE_PATH, fixture_dir=None) -> dict:
+    """
+    Re-fetch both Wikipedia pages, concurrently and with conditional GETs, and
+    rewrite the cache. Pages answering 304 are not re-parsed; their cached
+    tables are reused.
+    """
+    cache = read_alias_cache(cache_path) or {}
+    sources = cache.get("sources", {})
+    parsers = {
+        "countries": (wiki_url, lambda html: parse_countries(html)[0]),
+        "iso": (iso_url, parse_iso_standards),
+    }
+
+    pages = {}
+    for name, (url, _) in parsers.items():
+        previous = sources.get(name, {})
+        pages[name] = (url, previous.get("validators") if previous.get("url") == url else None)
+    fetched = fetch_pages(pages, headers, fixture_dir=fixture_dir)
+
+    tables = {}
+    for name, (url, parse) in parsers.items():
+        previous = sources.get(name, {})
+        html, validators = fetched[name]
+        if html is None:
+            tables[name] = pd.DataFrame(previous["table"])
+        else:
+            tables[name] = parse(html)
+        sources[name] = {"url": url, "validators": validators, "table": _records(tables[name])}
+
+    cache = {
+        "version": ALIAS_CACHE_VERSION,
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+        "sources": sources,
+        "aliases": build_alias_dict(tables["countries"], tables["iso"]),
+    }
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as file:
+        json.dump(cache, file, ensure_ascii=False)
+
+    return cache["aliases"]
+
+def load_country_aliases(
+    wiki_url: str,
+    iso_url: str,
+    headers: dict,
+    cache_path=ALIAS_CACHE_PATH,
+    ttl_days=ALIAS_CACHE_TTL_DAYS,
+    refresh=False,
+    fixture_dir=None
+) -> dict:
+    """
+    Return the ISO code -> official name dict, served from the on-disk cache
+    while it is younger than ttl_days. A stale cache is refreshed, and is still
+    used (with a warning) when the pages cannot be reached. fixture_dir reads
+    the pages from saved files instead (see src.fetch).
+    """
+    cache = read_alias_cache(cache_path)
+    if cache is not None and not refresh:
+        urls = {cache["sources"][name]["url"] for name in cache["sources"]}
+        age = datetime.now(timezone.utc) - datetime.fromisoformat(cache["fetched_at"])
+        if urls == {wiki_url, iso_url} and age.days < ttl_days:
+            return cache["aliases"]
+
+    import requests
+
+    try:
+        return refresh_country_aliases(wiki_url, iso_url, headers, cache_path, fixture_dir)
+    except requests.RequestException as err:
+        if cache is None:
+            raise
+        warnings.warn(f"Could not refresh country aliases ({err}); using cache from {cache['fetched_at']}")
+        return cache["aliases"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the cached country alias snapshot.")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--cache-path", default=ALIAS_CACHE_PATH)
+    parser.add_argument("--refresh", action="store_true", help="ignore the TTL and re-check the source pages")
+    parser.add_argument("--fixture-dir", help="read the pages from saved files in this directory instead")
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        params = yaml.safe_load(file)
+
+    aliases = load_country_aliases(
+        params["wiki_countries_url"],
+        params["country_codes_url"],
+        params["headers"],
+        cache_path=args.cache_path,
+        refresh=args.refresh,
+        fixture_dir=args.fixture_dir
+    )
+    print(f"{len(aliases)} country aliases cached in {args.cache_path}")
@@ -0,0 +1,147 @@
+"""
+Incremental evidence runs: each export of the evidence csv is mostly the
+previous one plus a few new studies, so the normalized rows and the
+distinct-study counts are persisted and only inserted, changed or deleted
+rows are processed on the next run. The counts are those of the
+dashboard's aggregate tables (count_tables), so src.export writes them
+without re-aggregating.
+"""
+import json
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+from src.cache import CACHE_DIR
+from src.process import normalize_evidence, build_long_table
+from src.cube import CUBE_DIMENSIONS
+
+STATE_PATH = CACHE_DIR / "evidence_state.pkl"
+STATE_VERSION = 3
+
+COUNT_KEYS = ["tier", "dimension", "value"]
+
+def _row_keys(df, id_col="study_id") -> pd.MultiIndex:
+    """
+    (study_id, content hash, occurrence) per row. The occurrence number keeps
+    identical rows apart, so adding or removing a duplicate is a change too.
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    occurrence = hashes.groupby(hashes).cumcount()
+    return pd.MultiIndex.from_arrays(
+        [df[id_col].astype(str).to_numpy(), hashes.to_numpy(), occurrence.to_numpy()],
+        names=["study_id", "row_hash", "occurrence"],
+    )
+
+def _fingerprint(columns, country_dict, region_dict, fuzzy=False) -> str:
+    """Changes whenever a saved state can no longer be reused."""
+    payload = json.dumps(
+        [STATE_VERSION, list(columns), country_dict, region_dict, fuzzy], sort_keys=True, default=str
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def _contributions(rows, tier_col="validation_number") -> pd.Series:
+    """
+    How many times each (tier, dimension, value, study_id) occurs in the
+    normalized rows, including one ("tier", tier) entry per row.
+    """
+    long_df = build_long_table(rows, dimensions=CUBE_DIMENSIONS, tier_col=tier_col)
+    tiers = pd.DataFrame({
+        "study_id": rows["study_id"].to_numpy(),
+        "tier": rows[tier_col].to_numpy(),
+        "dimension": "tier",
+        "value": rows[tier_col].to_numpy(),
+    })
+    long_df = pd.concat([long_df.astype({"dimension": str}), tiers], ignore_index=True)
+    return long_df.groupby(COUNT_KEYS + ["study_id"], dropna=False).size()
+
+def _distinct_counts(support: pd.Series) -> pd.Series:
+    return support.groupby(level=COUNT_KEYS, dropna=False, sort=False).size()
+
+def load_state(state_path=STATE_PATH):
+    state_path = Path(state_path)
+    if not state_path.exists():
+        return None
+    return pd.read_pickle(state_path)
+
+def update_evidence(
+    raw, country_dict, region_dict, state_path=STATE_PATH, tier_col="validation_number", fuzzy=False, cache_dir=None
+):
+    """
+    Normalize the raw evidence rows, reusing the rows already normalized in
+    the previous run, and update the persisted distinct-study counts by the
+    rows inserted and deleted since then. A changed row counts as one of each.
+
+    Returns (evidence_data, counts): the normalized rows in the order of raw,
+    and a (tier, dimension, value, count) frame of distinct studies, where
+    dimension is one of the long-table dimensions or "tier". fuzzy and
+    cache_dir are passed on to normalize_evidence.
+    """
+    keys = _row_keys(raw)
+    fingerprint = _fingerprint(raw.columns, country_dict, region_dict, fuzzy)
+
+    state = load_state(state_path)
+    if state is None or state["fingerprint"] != fingerprint:
+        rows = normalize_evidence(raw.iloc[:0].copy(), country_dict, region_dict).set_axis(keys[:0])
+        support = _contributions(rows, tier_col)
+        state = {"rows": rows, "support": support, "counts": _distinct_counts(support)}
+
+    inserted = ~keys.isin(state["rows"].index)
+    deleted = ~state["rows"].index.isin(keys)
+
+    new_rows = normalize_evidence(
+        raw[inserted].copy(), country_dict, region_dict, fuzzy=fuzzy, cache_dir=cache_dir
+    ).set_axis(keys[inserted])
+    rows = pd.concat([state["rows"][~deleted], new_rows])
+
+    # update the (tier, dimension, value, study) multiplicities by the delta only
+    added = _contributions(new_rows, tier_col)
+    removed = _contributions(state["rows"][deleted], tier_col)
+    support = (
+        pd.concat([state["support"], added, -removed])
+        .groupby(level=COUNT_KEYS + ["study_id"], dropna=False, sort=False)
+        .sum()
+    )
+    support = support[support > 0]
+
+    # and recount the distinct studies of the (tier, dimension, value) keys they touch
+    counts = state["counts"]
+    touched = added.index.append(removed.index).droplevel("study_id").unique()
+    if len(touched):
+        counts = counts[~counts.index.isin(touched)]
+        affected = support[support.index.droplevel("study_id").isin(touched)]
+        counts = pd.concat([counts, _distinct_counts(affected)])
+
+    state = {
+        "version": STATE_VERSION,
+        "fingerprint": fingerprint,
+        "rows": rows,
+        "support": support,
+        "counts": counts,
+    }
+    Path(state_path).parent.mkdir(parents=True, exist_ok=True)
+    pd.to_pickle(state, state_path)
+
+    evidence_data = rows.reindex(keys).reset_index(drop=True)
+    return evidence_data, counts.rename("count").reset_index()
+
+def count_tables(counts, tier_col="validation_number", dimensions=CUBE_DIMENSIONS) -> dict:
+    """
+    agg_tier_dimension and agg_tier of the counts update_evidence returns, in
+    the layout src.export.aggregate_tables builds from the cube. Rows without
+    a tier are left out, as the cube roll-ups leave them out.
+    """
+    counts = counts[counts["tier"].notna() & (counts["count"] > 0)]
+    by_dimension = counts[counts["dimension"] != "tier"]
+    frames = [
+        by_dimension[by_dimension["dimension"] == dimension].sort_values(["tier", "value"])
+        for dimension in dimensions
+    ]
+    agg = pd.concat(frames, ignore_index=True).rename(columns={"tier": tier_col})
+    agg["value"] = agg["value"].astype(str)
+
+    totals = counts[counts["dimension"] == "tier"].sort_values("tier", ignore_index=True)
+    return {
+        "agg_tier_dimension": agg[[tier_col, "dimension", "value", "count"]],
+        "agg_tier": pd.DataFrame({tier_col: totals["tier"].to_numpy(), "count": totals["count"].to_numpy()}),
+    }
@@ -0,0 +1,127 @@
+import re
+import json
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+from src.cache import file_fingerprint, cache_file
+
+## evidence csv: only the columns the analyses use, with an explicit schema
+REJECTION_COLUMNS = [f"rejection_criterion_level_{level}" for level in range(1, 5)]
+EVIDENCE_COLUMNS = [
+    "study_id",
+    "product_id",
+    "validation_number",
+    "design_categorization_number",
+    "country_of_study",
+    "study_date",
+    *REJECTION_COLUMNS,
+]
+EVIDENCE_DTYPES = {
+    "study_id": "string",
+    "product_id": "string",
+    "country_of_study": object,
+    "study_date": object,
+    **{col: object for col in REJECTION_COLUMNS},
+}
+# parsed as numbers first, so that tiers keep comparing with 1, 2, ... and "< 5"
+NUMERIC_CATEGORIES = ["validation_number", "design_categorization_number"]
+SCHEMA_VERSION = 1
+
+def _schema_key(columns) -> str:
+    payload = json.dumps([SCHEMA_VERSION, list(columns), {k: str(v) for k, v in EVIDENCE_DTYPES.items()}])
+    return hashlib.sha1(payload.encode()).hexdigest()[:8]
+
+def read_evidence_csv(path, columns=EVIDENCE_COLUMNS, **read_csv_kwargs) -> pd.DataFrame:
+    """
+    Read the evidence csv with the explicit schema, keeping only the given
+    columns that exist in the file.
+    """
+    df = pd.read_csv(
+        path,
+        usecols=lambda col: col in columns,
+        dtype={k: v for k, v in EVIDENCE_DTYPES.items() if k in columns},
+        **read_csv_kwargs,
+    )
+    return apply_evidence_categories(df)
+
+def read_evidence_chunks(path, chunksize=100_000, columns=EVIDENCE_COLUMNS, **read_csv_kwargs):
+    """read_evidence_csv one chunk of chunksize rows at a time, for files larger than memory."""
+    with pd.read_csv(
+        path,
+        usecols=lambda col: col in columns,
+        dtype={k: v for k, v in EVIDENCE_DTYPES.items() if k in columns},
+        chunksize=chunksize,
+        **read_csv_kwargs,
+    ) as reader:
+        for chunk in reader:
+            yield apply_evidence_categories(chunk)
+
+def apply_evidence_categories(df) -> pd.DataFrame:
+    """
+    Tier and design numbers become categoricals; the rejection criterion
+    levels share one categorical dtype, so values can move between levels.
+    """
+    for col in NUMERIC_CATEGORIES:
+        if col in df:
+            df[col] = pd.to_numeric(df[col]).astype("category")
+
+    rejection_cols = [col for col in REJECTION_COLUMNS if col in df]
+    if rejection_cols:
+        labels = pd.unique(df[rejection_cols].to_numpy().ravel())
+        dtype = pd.CategoricalDtype(sorted(label for label in labels if pd.notna(label)))
+        df[rejection_cols] = df[rejection_cols].astype(dtype)
+    return df
+
+def load_evidence(path, columns=EVIDENCE_COLUMNS, use_cache=True) -> pd.DataFrame:
+    """
+    Load the evidence csv through a pickled sidecar in data/cache, which is
+    rebuilt whenever the csv (size/mtime) changes. Each set of columns (and
+    schema) has a sidecar of its own.
+    """
+    if not use_cache:
+        return read_evidence_csv(path, columns)
+
+    cached = cache_file(f"evidence-{Path(path).stem}-{_schema_key(columns)}", file_fingerprint(path))
+    if cached.exists():
+        return pd.read_pickle(cached)
+
+    df = read_evidence_csv(path, columns)
+    df.to_pickle(cached)
+    return df
+
+## workbooks: one sheet at a time, cached on the file's bytes
+def read_workbook_sheet(path, sheet_name=0, columns=None, **read_excel_kwargs) -> pd.DataFrame:
+    """
+    Read one sheet of an .xlsx workbook, keeping only the given columns. The
+    openpyxl engine opens the workbook read-only and streams the cell values,
+    and no other sheet is parsed.
+    """
+    return pd.read_excel(
+        path,
+        sheet_name=sheet_name,
+        usecols=None if columns is None else (lambda col: col in columns),
+        engine="openpyxl",
+        **read_excel_kwargs,
+    )
+
+def load_workbook_sheet(path, sheet_name=0, columns=None, use_cache=True, **read_excel_kwargs) -> pd.DataFrame:
+    """
+    read_workbook_sheet through a pickle in data/cache, keyed on a hash of
+    the workbook's content, so a workbook copied or re-synced unchanged is
+    not parsed again.
+    """
+    if not use_cache:
+        return read_workbook_sheet(path, sheet_name, columns, **read_excel_kwargs)
+
+    options = json.dumps([SCHEMA_VERSION, columns and list(columns), read_excel_kwargs], sort_keys=True, default=str)
+    name = re.sub(r"[^\w.]+", "_", f"{Path(path).stem}_{sheet_name}")
+    options_key = hashlib.sha1(options.encode()).hexdigest()[:8]  # each column selection has an entry of its own
+    cached = cache_file(f"workbook-{name}-{options_key}", file_fingerprint(path, content=True))
+    if cached.exists():
+        return pd.read_pickle(cached)
+
+    df = read_workbook_sheet(path, sheet_name, columns, **read_excel_kwargs)
+    df.to_pickle(cached)
+    return df
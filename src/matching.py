@@ -0,0 +1,95 @@
+"""
+Country strings that are not an alias of the country dict as written: they
+are looked up again folded (casefolded, accents and punctuation stripped),
+and what is still unresolved is matched fuzzily, distinct strings only, with
+rapidfuzz. Fuzzy results can be remembered in a json file of a cache
+directory the caller names.
+"""
+import re
+import json
+import hashlib
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from src.cache import cache_file, write_atomic
+
+FUZZY_CUTOFF = 90
+# shorter strings are codes or abbreviations, too close to each other to match fuzzily
+MIN_FUZZY_LENGTH = 4
+
+def fold(name) -> str:
+    """Casefolded name without accents, punctuation or repeated spaces."""
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return re.sub(r"[\W_]+", " ", name.casefold()).strip()
+
+def build_match_index(country_dict) -> dict:
+    """
+    Folded alias -> name lookup for the alias -> name country_dict (names
+    match themselves). Codes ("NA", "PR") are left out, as they only mean a
+    country written as they are, and so are folded forms shared by aliases
+    of different names.
+    """
+    pairs = pd.DataFrame({
+        "alias": [*country_dict.keys(), *country_dict.values()],
+        "name": [*country_dict.values(), *country_dict.values()],
+    }).dropna()
+    pairs = pairs[~pairs["alias"].astype(str).str.fullmatch(r"[A-Z]{2,3}")]
+    pairs["folded"] = pairs["alias"].map(fold)
+    pairs = pairs[pairs["folded"] != ""].drop_duplicates(["folded", "name"])
+    pairs = pairs[~pairs["folded"].duplicated(keep=False)]
+
+    folded = dict(zip(pairs["folded"], pairs["name"]))
+    choices = [key for key in folded if len(key) >= MIN_FUZZY_LENGTH]
+    fingerprint = hashlib.sha1(json.dumps(sorted(folded.items())).encode()).hexdigest()[:16]
+    return {"folded": folded, "choices": choices, "fingerprint": fingerprint}
+
+def _fuzzy_matches(queries, index, cutoff) -> dict:
+    """Best choice at or above cutoff for each folded query, in one batched cdist."""
+    from rapidfuzz import fuzz, process
+
+    if not queries or not index["choices"]:
+        return {query: None for query in queries}
+    scores = process.cdist(
+        queries, index["choices"], scorer=fuzz.token_sort_ratio, score_cutoff=cutoff, workers=-1
+    )
+    best = scores.argmax(axis=1)
+    found = scores[np.arange(len(queries)), best] > 0  # scores under cutoff are 0
+    return {
+        query: index["folded"][index["choices"][choice]] if ok else None
+        for query, choice, ok in zip(queries, best, found)
+    }
+
+def resolve_countries(names, index, cutoff=FUZZY_CUTOFF, cache_name=None, cache_dir=None) -> pd.Series:
+    """
+    Name from the match index for each of the names (a Series), or None.
+    Only the distinct folded names are matched; with cache_name and
+    cache_dir, fuzzy results are kept in <cache_dir>/matches-<cache_name>-*.json
+    for the next runs with the same index and cutoff. Nothing is written
+    without them.
+    """
+    codes, uniques = pd.factorize(names.map(fold, na_action="ignore"))
+    resolved = pd.Series(uniques, dtype=object).map(index["folded"])
+
+    unresolved = [
+        query for query in uniques[resolved.isna().to_numpy()] if len(query) >= MIN_FUZZY_LENGTH
+    ]
+    if unresolved:
+        matches = {}
+        cached = cache_name is not None and cache_dir is not None
+        if cached:
+            path = cache_file(f"matches-{cache_name}", f"{index['fingerprint']}-{cutoff}", suffix=".json", cache_dir=cache_dir)
+            matches = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+        missing = [query for query in unresolved if query not in matches]
+        if missing:
+            matches.update(_fuzzy_matches(missing, index, cutoff))
+            if cached:
+                write_atomic(path, json.dumps(matches, ensure_ascii=False, indent=1))
+
+        resolved = resolved.combine_first(pd.Series(uniques, dtype=object).map(matches).astype(object))
+
+    resolved = np.append(resolved.where(resolved.notna(), None).to_numpy(), None)
+    return pd.Series(resolved[codes], index=names.index, dtype=object)  # code -1 picks the trailing None
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import yaml
+import pandas as pd
+
+from src.get_countries import load_country_aliases
+from src.cache import CACHE_DIR
+from src.loaders import load_evidence
+from src.process import normalize_evidence
+from src.incremental import update_evidence
+
+CONFIG_PATH = "config.yaml"
+
+def project_home() -> Path:
+    """Folder the Dropbox paths of config.yaml are relative to."""
+    home = Path.home()
+    if home.name == "evans":
+        home = Path("D:/Dropbox")
+    return home
+
+def load_params(config_path=CONFIG_PATH) -> dict:
+    # load yaml file with parameters
+    with open(config_path, 'r') as file:
+        return yaml.safe_load(file)
+
+def load_regions(region_path) -> dict:
+    """Country -> region dict from the regions csv."""
+    region_data = pd.read_csv(region_path, encoding="cp1252")
+    region_data["country"] = region_data["country"].str.replace("'","").str.replace(",","").str.replace('"','').str.strip()
+    region_data.dropna(subset=["class_region"], inplace=True, ignore_index=True)
+    return region_data.set_index("country")["class_region"].to_dict()
+
+def incremental_evidence(params: dict, home=None) -> tuple:
+    """
+    prepare_evidence's rows through src/incremental.py, with the
+    distinct-study counts it keeps up to date: (evidence_data, counts).
+    """
+    home = project_home() if home is None else home
+    evidence_data = load_evidence(home / params["evidence_path"])
+    alt_country_dict = load_country_aliases(params["wiki_countries_url"], params["country_codes_url"], params["headers"])
+    return update_evidence(
+        evidence_data, alt_country_dict, load_regions(params["regions"]), fuzzy=True, cache_dir=CACHE_DIR
+    )
+
+def prepare_evidence(params: dict, home=None, incremental=False) -> pd.DataFrame:
+    """
+    Load the evidence csv and add study years, normalized countries and their
+    regions, as the analysis scripts do: aliases missing from the alias dict
+    are fuzzy-matched, with the matches cached under data/cache. Tiers are
+    left as numbers. With
+    incremental, only rows changed since the previous incremental run are
+    normalized (see incremental_evidence).
+    """
+    if incremental:
+        return incremental_evidence(params, home)[0]
+
+    home = project_home() if home is None else home
+    evidence_data = load_evidence(home / params["evidence_path"])
+    alt_country_dict = load_country_aliases(params["wiki_countries_url"], params["country_codes_url"], params["headers"])
+    region_data_dict = load_regions(params["regions"])
+    return normalize_evidence(evidence_data, alt_country_dict, region_data_dict, fuzzy=True, cache_dir=CACHE_DIR)
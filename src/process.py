@@ -1,7 +1,15 @@
+import re
 import ast
+import json
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
+from src.matching import build_match_index, resolve_countries
+from src.encoding import encode_cells, explode_encoded
+
 def col_cleaning(df, col_name):
     print({col_name:df[col_name].unique()}, "\n")
 
@@ -18,41 +26,236 @@ def country_cleaning_(df, col, country_dict):
 
         df.at[k,col] = update_countries
 
+def _lookup(keys, mapping):
+    """Map a Series of keys through a dict, looking each distinct key up only once."""
+    codes, uniques = pd.factorize(keys)
+    table = pd.Series(uniques, dtype=object).map(mapping).to_numpy(dtype=object)
+    return pd.Series(table[codes], index=keys.index, dtype=object)
+
+def _join_tokens(tokens, sep):
+    """Re-join exploded tokens per index label; single-token cells need no join."""
+    multi = tokens.index.duplicated(keep=False)
+    return pd.concat([
+        tokens[~multi],
+        tokens[multi].groupby(level=0, sort=False).agg(sep.join),
+    ])
+
+def normalize_countries(df, col, country_dict, region_dict=None, region_col="region", fuzzy=False, cache_dir=None):
+    """
+    Normalize the comma-separated country/alias values in df[col] using
+    country_dict and, if region_dict is given, write their regions to
+    df[region_col] with map_regions.
+
+    Vectorized equivalent of country_cleaning followed by applying
+    functions.country_to_region: only the distinct cells are split, each
+    distinct alias is looked up once, and the results are broadcast back.
+    Aliases not in country_dict as written are kept as they are, unless fuzzy
+    is set: they are then resolved through src.matching, whose fuzzy matches
+    are remembered under cache_dir if given.
+    """
+    codes, uniques = pd.factorize(df[col])  # missing cells get code -1
+    uniques = pd.Series(uniques, dtype=object)
+    is_str = uniques.map(lambda x: isinstance(x, str))
+
+    tokens = uniques[is_str].str.split(",").explode()
+    mapped = _lookup(tokens.str.strip(), country_dict)
+    if fuzzy and mapped.isna().any():
+        unresolved = mapped.isna()
+        index = build_match_index(country_dict)
+        mapped[unresolved] = resolve_countries(
+            tokens[unresolved].str.strip(), index, cache_name="countries", cache_dir=cache_dir
+        ).to_numpy()
+    countries = mapped.where(mapped.notna(), tokens)  # fallback to original if not found
+
+    if is_str.any():
+        cleaned = uniques.copy()
+        cleaned.update(_join_tokens(countries, ", "))
+        df[col] = np.where(codes >= 0, cleaned.to_numpy()[codes], df[col].to_numpy(dtype=object))
+
+    if region_dict is not None:
+        map_regions(df, col, region_dict, region_col)
+    return df
+
+def map_regions(df, col, region_dict, region_col="region"):
+    """
+    Write the regions of the comma-separated countries in df[col] to
+    df[region_col], for cells whose countries are normalized already (as
+    normalize_countries leaves them). Each distinct cell is split and looked
+    up once.
+    """
+    codes, uniques = pd.factorize(df[col])  # missing cells get code -1
+    uniques = pd.Series(uniques, dtype=object)
+    is_str = uniques.map(lambda x: isinstance(x, str))
+
+    tokens = uniques[is_str].str.split(",").explode().str.strip()
+    regions = pd.Series(None, index=uniques.index, dtype=object)
+    regions.update(_join_tokens(_lookup(tokens, region_dict).dropna(), ","))
+    regions.update(_lookup(uniques[~is_str], region_dict).dropna())
+    regions = np.append(regions.where(regions.notna(), None).to_numpy(), None)
+    df[region_col] = regions[codes]  # code -1 picks the trailing None
+    return df
+
 def country_cleaning(df, col, country_dict):
     """
     Normalize country/alias values in df[col] using mapping dict.
-    df[col] is expected to contain lists of country strings.
+    df[col] is expected to contain comma-separated country strings.
     """
-    def normalize_list(countries):
-        update_countries = []
-        if pd.isna(countries):
-            return
-        for country in countries.split(","):
-            if not isinstance(country, str):
-                continue
-            # normalize key for lookup
-            key = country.strip()
-            mapped = country_dict.get(key, country)  # fallback to original if not found
-            update_countries.append(mapped)
-        return ", ".join(update_countries)
-
-    df[col] = df[col].apply(lambda x: normalize_list(x) if isinstance(x, str) else x)
+    return normalize_countries(df, col, country_dict)
+
+def normalize_evidence(df, country_dict, region_dict, fuzzy=False, cache_dir=None):
+    """
+    Add study years, normalized countries and their regions to the raw
+    evidence rows, in place. Tiers are left as numbers. fuzzy and cache_dir
+    are passed on to normalize_countries.
+    """
+    df["study_year"] = study_year(df["study_date"])
+    normalize_countries(df, "country_of_study", country_dict, region_dict, fuzzy=fuzzy, cache_dir=cache_dir)
     return df
 
+## long-format (study_id, tier, dimension, value) rows shared by the distribution charts
+LONG_DIMENSIONS = ["country_of_study", "region", "study_year"]
+
+def _broadcast(codes, tokens):
+    """
+    (row position, value) pairs for rows holding the distinct cell each code
+    refers to, given the tokens of every distinct cell indexed by its code.
+    """
+    rows = pd.DataFrame({"row": np.flatnonzero(codes >= 0), "code": codes[codes >= 0]})
+    pairs = rows.merge(
+        tokens.rename("value").rename_axis("code").reset_index(), on="code"
+    )
+    return pairs["row"].to_numpy(), pairs["value"]
+
+def _explode_cells(values):
+    """
+    Split comma-joined cells into (row position, value) pairs, dropping
+    missing, blank and "nan" values. Only the distinct cells are split.
+    """
+    encoded = encode_cells(values)
+    rows, codes = explode_encoded(encoded)
+    return rows, pd.Series(encoded["dictionary"].to_numpy(dtype=object)[codes], dtype=object)
+
+## study years, parsed in bulk from the study_date strings
+YEAR_PATTERN = r"(?<!\d)((?:19|20)\d{2})(?!\d)"
+
+def _distinct_years(uniques):
+    """
+    Years of each distinct date string, indexed by its position: the year of
+    a full date ("2019-05-01", "2019-05"), otherwise every year mentioned
+    ("2019", "2018, 2019", "2018-2019").
+    """
+    uniques = pd.Series(uniques, dtype=object).astype(str)
+    full_dates = pd.to_datetime(
+        uniques.where(uniques.str.contains("-", regex=False)), format="ISO8601", errors="coerce"
+    )
+    years = uniques.str.findall(YEAR_PATTERN).explode().dropna().astype(int)
+    parsed = full_dates.notna()
+    parts = [full_dates[parsed].dt.year, years[~parsed.reindex(years.index).to_numpy()]]
+    parts = [part for part in parts if len(part)]  # concat of empty parts is deprecated
+    years = pd.concat(parts) if parts else pd.Series(dtype="Int64")
+    return years.sort_index(kind="stable").astype("Int64")
+
+def explode_study_years(dates):
+    """
+    One entry per year each date cell mentions, as a nullable integer Series
+    indexed by the row positions of dates; cells without a year are left out.
+    """
+    codes, uniques = pd.factorize(dates)  # missing cells get code -1
+    rows, years = _broadcast(codes, _distinct_years(uniques))
+    return pd.Series(years.to_numpy(), index=rows, dtype="Int64")
+
+def study_year(dates):
+    """
+    Nullable integer year of each date cell: the year of a full date,
+    otherwise the earliest year mentioned, or <NA> if none.
+    """
+    years = explode_study_years(dates)
+    earliest = years.groupby(level=0).min().reindex(range(len(dates)))
+    return pd.Series(earliest.to_numpy(), index=dates.index, dtype="Int64")
+
+# dimensions exploded from another column when it is present
+LONG_SOURCES = {"study_year": "study_date"}
+
+def build_long_table(
+    df,
+    dimensions=LONG_DIMENSIONS,
+    tier_col="validation_number",
+    id_col="study_id",
+    year_dimensions=("study_year",)
+):
+    """
+    Explode the multi-valued columns of df once into a long table with one
+    (study_id, tier, dimension, value) row per value. Year dimensions hold
+    every year the study mentions, read from study_date when df has it, so
+    multi-year studies count in each of their years.
+    """
+    ids = df[id_col].to_numpy()
+    tiers = df[tier_col].to_numpy()
+
+    frames = []
+    for dimension in dimensions:
+        source = LONG_SOURCES.get(dimension, dimension)
+        source = source if source in df else dimension
+        if dimension in year_dimensions:
+            years = explode_study_years(df[source])
+            rows, values = years.index.to_numpy(), years.astype(int)
+        else:
+            rows, values = _explode_cells(df[source])
+        frames.append(pd.DataFrame({
+            "study_id": ids[rows],
+            "tier": tiers[rows],
+            "dimension": dimension,
+            "value": values.to_numpy(dtype=object),
+        }))
+
+    long_df = pd.concat(frames, ignore_index=True)
+    long_df["dimension"] = long_df["dimension"].astype("category")
+    return long_df
+
+def long_dimension(long_df, dimension, tier_col="validation_number"):
+    """Rows of one dimension, with the tier and value columns named as in the wide frame."""
+    data = long_df[long_df["dimension"] == dimension]
+    return pd.DataFrame({
+        "study_id": data["study_id"].to_numpy(),
+        tier_col: data["tier"].to_numpy(),
+        dimension: data["value"].infer_objects().to_numpy(),
+    })
+
 ### user processing. if user is student, product type should be learning, if teacher, then teaching, if school, admin works etc.
 def verify_user_product_type():
     pass
 
 
 #%%
+# json.loads parses these differently from ast.literal_eval (or not at all)
+_JSON_UNSAFE = re.compile(r"\\|\b(?:true|false|null|NaN|Infinity)\b")
+
+def _parse_literal(value):
+    """ast.literal_eval, with json.loads as a fast path where both give the same result."""
+    if not _JSON_UNSAFE.search(value):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return ast.literal_eval(value)
+
 def clean_agents_data(value):
     #value = row["variable_value"]
     if pd.isna(value) or isinstance(value, int):
         return value
-    
+    if isinstance(value, str):
+        return _clean_agents_string(value)
+    return _clean_agents_value(value)
+
+# the same serialized lists repeat across thousands of products, so results are memoized
+@lru_cache(maxsize=1 << 16)
+def _clean_agents_string(value):
+    return _clean_agents_value(value)
+
+def _clean_agents_value(value):
     if (value.startswith("[") and value.endswith("]")) or (value.startswith("{") and value.endswith("}")):
         try:
-            df = ast.literal_eval(value)
+            df = _parse_literal(value)
             rl_vals = []
             if isinstance(df, dict):
                 rl_vals.append(df[list(df.keys())[0]])
@@ -87,6 +290,26 @@ def clean_agents_data(value):
     else:
         return value
 
+def clean_agents_column(values, processes=None, min_parallel=50_000):
+    """
+    clean_agents_data over a Series, evaluated once per distinct string.
+    With processes > 1 and at least min_parallel distinct strings, they are
+    spread over a process pool. Same result as values.apply(clean_agents_data).
+    """
+    is_str = values.map(lambda x: isinstance(x, str)).to_numpy(dtype=bool)
+    codes, uniques = pd.factorize(values[is_str])
+
+    if processes and processes > 1 and len(uniques) >= min_parallel:
+        with ProcessPoolExecutor(processes) as pool:
+            cleaned = list(pool.map(clean_agents_data, uniques, chunksize=2_000))
+    else:
+        cleaned = [clean_agents_data(value) for value in uniques]
+
+    result = np.empty(len(values), dtype=object)
+    result[is_str] = pd.Series(cleaned, dtype=object).to_numpy()[codes]
+    result[~is_str] = [clean_agents_data(value) for value in values[~is_str]]
+    return pd.Series(result, index=values.index, name=values.name).infer_objects()
+
 ##
 def clean_users(value, user1, user2):
     if pd.isna(value):
@@ -111,6 +334,62 @@ def clean_users(value, user1, user2):
         return value.replace(",","").strip()
 
 
+## Series-level versions of clean_users/capitalize_values, evaluated once per distinct string
+USER_UNITS = {
+    "thousand": 1e3,
+    "k": 1e3,
+    "lakh": 1e5,
+    "lakhs": 1e5,
+    "lac": 1e5,
+    "million": 1e6,
+    "mn": 1e6,
+    "crore": 1e7,
+    "crores": 1e7,
+    "billion": 1e9,
+    "bn": 1e9,
+}
+USER_COUNT_PATTERN = (
+    r"(?P<number>\d[\d,]*(?:\.\d+)?)\s*\+?\s*(?P<unit>" + "|".join(USER_UNITS) + r")?\b"
+)
+
+def clean_users_column(values):
+    """
+    Numeric user counts from free-text cells such as "12,000+", "5000 students",
+    "1.5 crore" or "3 lakh teachers", as a nullable integer Series: the first
+    number in the cell, without commas or "+", times its unit. Cells that are
+    "not stated" or hold no number become <NA>; integers are kept.
+    """
+    codes, uniques = pd.factorize(values)  # missing cells get code -1
+    uniques = pd.Series(uniques, dtype=object)
+    text = uniques.where(uniques.map(lambda x: isinstance(x, str)))
+
+    found = text.str.extract(USER_COUNT_PATTERN, flags=re.IGNORECASE)
+    counts = found["number"].str.replace(",", "", regex=False).astype(float)
+    counts = counts * found["unit"].str.lower().map(USER_UNITS).fillna(1)
+    counts = counts.where(~text.str.contains("not stated", case=False, na=False))
+
+    numbers = pd.to_numeric(uniques.where(text.isna()), errors="coerce")  # ints (and floats) kept as they are
+    counts = counts.fillna(numbers).round().to_numpy()
+
+    result = np.append(counts, np.nan)[codes]  # code -1 picks the trailing NaN
+    return pd.Series(pd.array(result, dtype="Int64"), index=values.index, name=values.name)
+
+def capitalize_column(values):
+    """
+    capitalize_values over a Series: every comma-separated part of a string
+    stripped and title-cased; other cells are kept.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    is_str = uniques.map(lambda x: isinstance(x, str)).to_numpy(dtype=bool)
+
+    cleaned = uniques.copy()
+    cleaned[is_str] = (
+        uniques[is_str].str.replace(r"\s*,\s*", ",", regex=True).str.strip().str.title()
+    )
+    result = np.where(codes >= 0, np.append(cleaned.to_numpy(), None)[codes], values.to_numpy(dtype=object))
+    return pd.Series(result, index=values.index, name=values.name)
+
 def capitalize_values(value):
     if pd.isna(value):
         return value
@@ -0,0 +1,100 @@
+"""
+Opt-in stage instrumentation for the scripts and the CLI. With the
+ESSA_PROFILE environment variable set (to 1, or to the path of the report),
+every stage records its wall time, rows in and out and the peak RSS of the
+process, and write_report saves them as a json run report. With
+ESSA_PROFILE_DIR also set, each stage is run under cProfile and dumped to
+<dir>/<stage>.prof (open with snakeviz or pstats). Unset, stages cost nothing.
+
+    ESSA_PROFILE=1 python evidence_analysis.py
+"""
+import os
+import sys
+import json
+import time
+import cProfile
+from pathlib import Path
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_ENV = "ESSA_PROFILE"
+PROFILE_DIR_ENV = "ESSA_PROFILE_DIR"
+REPORT_DIR = Path("data/profiles")
+
+_records = []
+_started_at = datetime.now(timezone.utc)
+
+def enabled() -> bool:
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0")
+
+def peak_rss_mb():
+    """Peak resident memory of the process so far in MB, or None where it is not available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 2**10, 1)  # bytes on macOS, KB elsewhere
+
+def _rows(data):
+    if data is None or isinstance(data, int):
+        return data
+    return len(data) if hasattr(data, "__len__") else None
+
+@contextmanager
+def stage(name, rows_in=None):
+    """
+    Record the block as a stage of the run report. rows_in is a row count or
+    the input frame; set record["rows_out"] on the yielded record likewise.
+    """
+    record = {"stage": name, "rows_in": _rows(rows_in), "rows_out": None}
+    if not enabled():
+        yield record
+        return
+
+    profile_dir = os.environ.get(PROFILE_DIR_ENV)
+    profiler = cProfile.Profile() if profile_dir else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler:
+            profiler.disable()
+            Path(profile_dir).mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(Path(profile_dir) / f"{name}.prof")
+        record["seconds"] = round(time.perf_counter() - start, 4)
+        record["rows_out"] = _rows(record["rows_out"])
+        record["peak_rss_mb"] = peak_rss_mb()
+        _records.append(record)
+
+def write_report(path=None):
+    """
+    Write the stages recorded so far to path (default: the ESSA_PROFILE value
+    if it is a path, else data/profiles/run-<time>.json) and clear them.
+    Returns the path, or None when profiling is off.
+    """
+    if not enabled():
+        return None
+    value = os.environ[PROFILE_ENV]
+    if path is None:
+        path = value if value not in ("1", "true") else REPORT_DIR / f"run-{_started_at:%Y%m%dT%H%M%S}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    report = {
+        "started_at": _started_at.isoformat(timespec="seconds"),
+        "argv": sys.argv,
+        "python": sys.version.split()[0],
+        "total_seconds": round(sum(record["seconds"] for record in _records), 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": list(_records),
+    }
+    with open(path, "w") as file:
+        json.dump(report, file, indent=1)
+    _records.clear()
+    return path
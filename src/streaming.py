@@ -0,0 +1,206 @@
+"""
+Chunked mode for evidence files larger than memory. The csv is read
+chunksize rows at a time; each chunk gets its normalized countries, their
+regions and its study years, and is reduced to a partial aggregate: per
+dimension, the distinct (tier, value, study) triples of the chunk, packed
+into int64 keys over the chunk's own dictionaries of studies, tiers and
+values. Partials merge by re-coding one onto the other's dictionaries and
+taking the union of the keys, so a study spread over chunks still counts
+once, and only the merged keys (8 bytes per distinct triple) and the
+dictionaries are kept between chunks. The distinct-study counts per (tier,
+dimension, value) are read off the merged keys at the end, in the layout
+of src.export.aggregate_tables.
+
+    python -m src.streaming [--chunksize 200000] [--out-dir data/powerbi] [--format csv|parquet]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from src.cache import CACHE_DIR
+from src.pipeline import load_params, load_regions, project_home
+from src.get_countries import load_country_aliases
+from src.loaders import read_evidence_chunks, NUMERIC_CATEGORIES
+from src.process import normalize_countries, explode_study_years
+from src.encoding import encode_cells, explode_encoded
+from src.cube import CUBE_DIMENSIONS, _plain
+from src.export import EXPORT_DIR, FORMATS, write_tables
+from src.profiling import stage, write_report
+
+CHUNKSIZE = 200_000
+# key layout: tier code << 56 | value code << 32 | study code
+VALUE_SHIFT, TIER_SHIFT = 32, 56
+MAX_CODES = {"study_id": 2**32, "value": 2**24, "tier": 2**7}
+TOTAL = None  # the keys of the per-tier totals, which have no value
+
+def _pack(tiers, values, studies) -> np.ndarray:
+    return (tiers.astype(np.int64) << TIER_SHIFT) | (values.astype(np.int64) << VALUE_SHIFT) | studies.astype(np.int64)
+
+def _unpack(keys) -> tuple:
+    return keys >> TIER_SHIFT, (keys >> VALUE_SHIFT) & (MAX_CODES["value"] - 1), keys & (MAX_CODES["study_id"] - 1)
+
+def _dictionary(uniques) -> pd.Index:
+    """Plain-valued Index of the uniques of pd.factorize."""
+    return pd.Index(_plain(pd.Series(uniques)).to_numpy())
+
+def _check_limits(dictionaries, tier_col):
+    for name, values in dictionaries.items():
+        limit = MAX_CODES.get(name, MAX_CODES["tier" if name == tier_col else "value"])
+        if len(values) > limit:
+            raise ValueError(f"more than {limit} distinct values of {name} for the packed keys")
+
+def _labels(partial, name) -> pd.Index:
+    """
+    Dictionary of name with the dtype reading the whole csv gives it: the
+    numeric categories are kept as floats in the partials, whatever the
+    chunk they come from, and are integers again unless a chunk read them
+    as floats (a missing or fractional value).
+    """
+    values = partial["dictionaries"][name]
+    if name in NUMERIC_CATEGORIES and name not in partial["floats"]:
+        return values.astype(np.int64)
+    return values
+
+def chunk_partial(
+    chunk,
+    country_dict,
+    region_dict,
+    fuzzy=False,
+    cache_dir=None,
+    tier_col="validation_number",
+    id_col="study_id",
+    country_col="country_of_study",
+    region_col="region",
+    year_col="study_year",
+    design_col="design_categorization_number",
+) -> dict:
+    """
+    Partial aggregate of one chunk of raw evidence rows: {"dictionaries":
+    {name: Index}, "keys": {dimension: int64 keys}, "floats": names of the
+    numeric categories the chunk read as floats}. Regions are those of the
+    countries and years are read from study_date, as in build_cube. fuzzy
+    and cache_dir are passed on to normalize_countries.
+    """
+    normalize_countries(chunk, country_col, country_dict, fuzzy=fuzzy, cache_dir=cache_dir)
+    studies, study_ids = pd.factorize(chunk[id_col])
+    tiers, tier_values = pd.factorize(chunk[tier_col])  # missing values get code -1
+    dictionaries = {id_col: _dictionary(study_ids), tier_col: _dictionary(tier_values)}
+    pairs = {TOTAL: (np.arange(len(chunk)), np.zeros(len(chunk), dtype=np.int64))}  # dimension: (rows, value codes)
+
+    encoded = encode_cells(chunk[country_col])
+    rows, countries = explode_encoded(encoded)
+    dictionaries[country_col], pairs[country_col] = encoded["dictionary"], (rows, countries)
+
+    region_codes, regions = pd.factorize(encoded["dictionary"].map(region_dict))  # region of each country code
+    dictionaries[region_col], pairs[region_col] = _dictionary(regions), (rows, region_codes[countries])
+
+    years = explode_study_years(chunk["study_date"] if "study_date" in chunk else chunk[year_col])
+    year_codes, year_values = pd.factorize(years)
+    dictionaries[year_col], pairs[year_col] = _dictionary(year_values), (years.index.to_numpy(), year_codes)
+
+    if design_col in chunk:
+        design_codes, designs = pd.factorize(chunk[design_col])
+        dictionaries[design_col], pairs[design_col] = _dictionary(designs), (np.arange(len(chunk)), design_codes)
+
+    # a chunk reads its tiers and designs as ints, or as floats if one is missing: all are floats here
+    floats = set()
+    for name in {tier_col, design_col} & set(NUMERIC_CATEGORIES) & set(dictionaries):
+        dtype = chunk[name].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtype = dtype.categories.dtype
+        if dtype.kind == "f":
+            floats.add(name)
+        dictionaries[name] = dictionaries[name].astype(np.float64)
+    _check_limits(dictionaries, tier_col)
+
+    keys = {}
+    for dimension, (rows, values) in pairs.items():
+        keep = (tiers[rows] >= 0) & (values >= 0)
+        keys[dimension] = pd.unique(_pack(tiers[rows][keep], values[keep], studies[rows][keep]))
+    return {"dictionaries": dictionaries, "keys": keys, "floats": floats}
+
+def merge_partials(merged, partial, tier_col="validation_number", id_col="study_id") -> dict:
+    """
+    The partial aggregate of the rows of both: partial's codes are mapped onto
+    merged's dictionaries, which only grow, and the keys are united.
+    """
+    if merged is None:
+        return partial
+
+    dictionaries, codes = dict(merged["dictionaries"]), {}
+    for name, values in partial["dictionaries"].items():
+        base = dictionaries.get(name, pd.Index([], dtype=values.dtype))
+        dictionaries[name] = base.append(values[base.get_indexer(values) < 0])
+        codes[name] = dictionaries[name].get_indexer(values)  # partial code -> merged code
+    _check_limits(dictionaries, tier_col)
+
+    keys = dict(merged["keys"])
+    for dimension, partial_keys in partial["keys"].items():
+        tiers, values, studies = _unpack(partial_keys)
+        values = values if dimension is TOTAL else codes[dimension][values]
+        recoded = _pack(codes[tier_col][tiers], values, codes[id_col][studies])
+        keys[dimension] = pd.unique(np.concatenate([keys.get(dimension, recoded[:0]), recoded]))
+    return {"dictionaries": dictionaries, "keys": keys, "floats": merged["floats"] | partial["floats"]}
+
+def partial_tables(partial, dimensions=CUBE_DIMENSIONS, tier_col="validation_number") -> dict:
+    """
+    agg_tier_dimension (distinct studies per tier, dimension and value) and
+    agg_tier (distinct studies per tier) of a partial aggregate, as
+    src.export.aggregate_tables builds them from the cube.
+    """
+    tier_values = _labels(partial, tier_col)
+    frames = []
+    for dimension in dimensions:
+        pairs = pd.Series(partial["keys"].get(dimension, np.empty(0, dtype=np.int64)) >> VALUE_SHIFT).value_counts(sort=False)
+        tiers, values, _ = _unpack(pairs.index.to_numpy() << VALUE_SHIFT)
+        frame = pd.DataFrame({
+            tier_col: tier_values[tiers],
+            "dimension": dimension,
+            "value": _labels(partial, dimension)[values] if len(values) else [],
+            "count": pairs.to_numpy(),
+        })
+        frames.append(frame.sort_values([tier_col, "value"], ignore_index=True))
+    counts = pd.concat(frames, ignore_index=True)
+    counts["value"] = counts["value"].astype(str)
+
+    totals = pd.Series(_unpack(partial["keys"][TOTAL])[0]).value_counts(sort=False)
+    totals = pd.DataFrame({tier_col: tier_values[totals.index.to_numpy()], "count": totals.to_numpy()})
+    return {"agg_tier_dimension": counts, "agg_tier": totals.sort_values(tier_col, ignore_index=True)}
+
+def stream_counts(path, country_dict, region_dict, chunksize=CHUNKSIZE, fuzzy=False, cache_dir=None, log=print) -> dict:
+    """The aggregate tables of the evidence csv at path, read chunk by chunk in bounded memory."""
+    merged = None
+    for i, chunk in enumerate(read_evidence_chunks(path, chunksize)):
+        with stage(f"chunk-{i}", chunk) as record:
+            merged = merge_partials(merged, chunk_partial(chunk, country_dict, region_dict, fuzzy, cache_dir))
+            record["rows_out"] = len(merged["keys"][TOTAL])
+        log(f"chunk {i}: {len(chunk)} rows, {sum(len(keys) for keys in merged['keys'].values())} keys")
+
+    if merged is None:
+        raise ValueError(f"{path} has no evidence rows")
+    return partial_tables(merged)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the aggregate tables of a large evidence csv, chunk by chunk.")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--evidence", help="csv to read instead of the evidence_path of the config")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--out-dir", default=str(EXPORT_DIR))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    args = parser.parse_args()
+
+    params = load_params(args.config)
+    country_dict = load_country_aliases(params["wiki_countries_url"], params["country_codes_url"], params["headers"])
+    evidence_path = args.evidence or project_home() / params["evidence_path"]
+
+    tables = stream_counts(
+        evidence_path, country_dict, load_regions(params["regions"]), args.chunksize, fuzzy=True, cache_dir=CACHE_DIR
+    )
+    for path in write_tables(tables, args.out_dir, args.format):
+        print(path)
+    write_report()  # with ESSA_PROFILE set
+
+
+if __name__ == "__main__":
+    main()
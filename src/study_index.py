@@ -0,0 +1,121 @@
+"""
+Inverted index of the aggregate cube: for every dimension, the sorted cube
+row ids holding each value. A filter such as
+
+    query(index, validation_number="Tier-1", region="Sub-Saharan Africa", study_year=slice(2019, None))
+
+intersects the row ids of its values instead of scanning and copying the
+cube, and the counts and long rows of the dashboard slices are read off the
+rows found. Cube rows are (study, tier, country, region, year, design)
+combinations, so combined filters hold within one combination, as
+slice_cube's do.
+"""
+import numpy as np
+import pandas as pd
+
+from src.cube import CUBE_DIMENSIONS, _plain
+
+def build_study_index(cube, dimensions=CUBE_DIMENSIONS, tier_col="validation_number", id_col="study_id") -> dict:
+    """
+    Per column of the cube: the code of every row's value, the sorted
+    distinct values, and the row ids grouped by value (order) with the
+    bounds of each value's group, so postings are slices and not copies.
+    """
+    studies, study_ids = pd.factorize(cube[id_col])
+    index = {"rows": len(cube), "tier_col": tier_col, "studies": studies, "study_ids": study_ids, "columns": {}}
+    for col in [tier_col, *dimensions]:
+        codes, uniques = pd.factorize(cube[col], sort=True)  # missing values get code -1
+        order = np.argsort(codes, kind="stable")  # row ids ascending within each value
+        bounds = np.searchsorted(codes[order], np.arange(-1, len(uniques) + 1))  # value c spans bounds[c + 1]:bounds[c + 2]
+        index["columns"][col] = {
+            "codes": codes,
+            "values": pd.Index(_plain(pd.Series(uniques)).to_numpy()),
+            "order": order,
+            "bounds": bounds,
+        }
+    return index
+
+def _value_codes(column, value):
+    """Codes of a filter value: one value, a list of values or an inclusive slice of sorted values."""
+    values = column["values"]
+    if isinstance(value, slice):
+        start = 0 if value.start is None else values.searchsorted(value.start, side="left")
+        stop = len(values) if value.stop is None else values.searchsorted(value.stop, side="right")
+        return np.arange(start, stop)
+    wanted = [value] if isinstance(value, str) or not pd.api.types.is_list_like(value) else list(value)
+    codes = values.get_indexer(wanted)
+    return np.unique(codes[codes >= 0])
+
+def postings(index, col, value) -> np.ndarray:
+    """Sorted row ids of the cube rows whose col holds value (see _value_codes)."""
+    column = index["columns"][col]
+    order, bounds = column["order"], column["bounds"]
+    groups = [order[bounds[code + 1]:bounds[code + 2]] for code in _value_codes(column, value)]
+    if len(groups) == 1:
+        return groups[0]
+    return np.sort(np.concatenate(groups)) if groups else np.empty(0, dtype=order.dtype)
+
+def query(index, **filters) -> np.ndarray:
+    """Sorted ids of the cube rows matching every filter; all rows without filters."""
+    if not filters:
+        return np.arange(index["rows"])
+    matches = sorted((postings(index, col, value) for col, value in filters.items()), key=len)
+    rows = matches[0]
+    for other in matches[1:]:
+        rows = np.intersect1d(rows, other, assume_unique=True)
+    return rows
+
+def count_studies(index, **filters) -> int:
+    """Distinct studies with a cube row matching the filters."""
+    return len(pd.unique(index["studies"][query(index, **filters)]))
+
+def index_counts(index, dimension, **filters) -> pd.DataFrame:
+    """
+    Distinct studies per (tier, value of dimension) among the matching rows,
+    as cube_counts returns them, counted on the codes of the index.
+    """
+    rows = query(index, **filters)
+    tier_col = index["tier_col"]
+    tiers, values = index["columns"][tier_col], index["columns"][dimension]
+    rows = rows[(tiers["codes"][rows] >= 0) & (values["codes"][rows] >= 0)]
+
+    n_values, n_studies = max(len(values["values"]), 1), max(len(index["study_ids"]), 1)
+    pairs = tiers["codes"][rows].astype(np.int64) * n_values + values["codes"][rows]
+    distinct = pd.unique(pairs * n_studies + index["studies"][rows])  # one entry per (tier, value, study)
+    counts = np.bincount(distinct // n_studies, minlength=len(tiers["values"]) * n_values)
+    found = np.flatnonzero(counts)
+    return pd.DataFrame({
+        tier_col: tiers["values"][found // n_values],
+        dimension: values["values"][found % n_values],
+        "count": counts[found],
+    })
+
+def _decode(values, codes) -> np.ndarray:
+    """Values of the codes, missing for code -1, as the cube column's to_numpy gives them."""
+    values = pd.Index(values)
+    if (codes < 0).any():
+        return values.take(codes, allow_fill=True, fill_value=np.nan).to_numpy()
+    return values.take(codes).to_numpy()
+
+def index_long(index, dimension, **filters) -> pd.DataFrame:
+    """
+    (study_id, tier, dimension, value) rows of the matching cube rows, as
+    cube_long returns them, decoded from the codes of the index: the first
+    row of each (study, tier, value) in cube order.
+    """
+    rows = query(index, **filters)
+    tiers, values = index["columns"][index["tier_col"]], index["columns"][dimension]
+    rows = rows[values["codes"][rows] >= 0]
+
+    n_tiers, n_values = len(tiers["values"]) + 1, max(len(values["values"]), 1)
+    triples = (index["studies"][rows].astype(np.int64) * n_tiers + tiers["codes"][rows] + 1) * n_values + values["codes"][rows]
+    rows = rows[~pd.Index(triples).duplicated()]
+
+    long_df = pd.DataFrame({
+        "study_id": _decode(index["study_ids"], index["studies"][rows]),
+        "tier": _decode(tiers["values"], tiers["codes"][rows]),
+        "dimension": dimension,
+        "value": values["values"][values["codes"][rows]].to_numpy(dtype=object),
+    })
+    long_df["dimension"] = long_df["dimension"].astype("category")
+    return long_df
@@ -0,0 +1,19 @@
+import pytest
+
+from src.loaders import apply_evidence_categories
+from tests.evidence import raw_evidence, country_dict, region_dict
+
+
+@pytest.fixture
+def raw():
+    return apply_evidence_categories(raw_evidence())
+
+
+@pytest.fixture
+def aliases():
+    return country_dict()
+
+
+@pytest.fixture
+def regions():
+    return region_dict()
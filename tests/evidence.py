@@ -0,0 +1,86 @@
+"""Synthetic evidence rows and the dictionaries the tests normalize them with."""
+import numpy as np
+import pandas as pd
+
+from src.cube import build_cube
+from src.export import aggregate_tables
+from src.loaders import read_evidence_csv
+from src.process import normalize_countries, study_year
+
+# (name, ISO-2, ISO-3, region) of the countries studies are drawn from
+COUNTRIES = [
+    ("Kenya", "KE", "KEN", "Sub-Saharan Africa"),
+    ("Uganda", "UG", "UGA", "Sub-Saharan Africa"),
+    ("Nigeria", "NG", "NGA", "Sub-Saharan Africa"),
+    ("Côte d'Ivoire", "CI", "CIV", "Sub-Saharan Africa"),
+    ("India", "IN", "IND", "South Asia"),
+    ("Nepal", "NP", "NPL", "South Asia"),
+    ("Brazil", "BR", "BRA", "MIC"),
+    ("Philippines", "PH", "PHL", "LMIC"),
+    ("United Kingdom", "GB", "GBR", "HIC"),
+    ("Chile", "CL", "CHL", "HIC"),
+]
+DATES = ["2019-05-01", "2021-11", "2018", "2017, 2019", "2020-2021", "n.d.", None]
+REASONS = [f"Rejection reason {i}" for i in range(1, 11)]
+
+
+def country_dict() -> dict:
+    """ISO-2/ISO-3 code -> country name, as load_country_aliases returns it."""
+    return {code: name for name, iso_2, iso_3, _ in COUNTRIES for code in (iso_2, iso_3)}
+
+
+def region_dict() -> dict:
+    """Country name -> region, as load_regions returns it."""
+    return {name: region for name, _, _, region in COUNTRIES}
+
+
+def _country_cells(rng, count):
+    """One to three countries per cell, written as names, ISO codes or the unknown "Global"."""
+    names = np.array([name for name, *_ in COUNTRIES], dtype=object)
+    codes = np.array([iso for _, iso, *_ in COUNTRIES], dtype=object)
+    cells = []
+    for size in rng.integers(1, 4, count):
+        picks = rng.choice(len(COUNTRIES), size, replace=False)
+        written = np.where(rng.random(size) < 0.3, codes[picks], names[picks])
+        if rng.random() < 0.05:
+            written[0] = "Global"
+        cells.append(", ".join(written))
+    return np.array(cells, dtype=object)
+
+
+def raw_evidence(rows=2000, seed=0, distinct_countries=200) -> pd.DataFrame:
+    """
+    Evidence rows as load_evidence returns them: studies repeat across rows,
+    some countries and dates are blank, every 37th tier and 41st design is
+    missing, and tier-1 rows have no rejection criteria.
+    """
+    rng = np.random.default_rng(seed)
+    tiers = rng.integers(1, 6, rows).astype(float)
+    countries = _country_cells(rng, distinct_countries)[rng.integers(0, distinct_countries, rows)]
+    countries[rng.random(rows) < 0.05] = None
+
+    df = pd.DataFrame({
+        "study_id": pd.Series(rng.integers(0, int(rows * 0.7), rows)).map("S{:07d}".format),
+        "product_id": pd.Series(rng.integers(0, 100, rows)).map("P{:04d}".format),
+        "validation_number": tiers,
+        "design_categorization_number": rng.integers(1, 6, rows).astype(float),
+        "country_of_study": countries,
+        "study_date": rng.choice(np.array(DATES, dtype=object), rows),
+    })
+    reasons = np.array(REASONS, dtype=object)
+    for level in range(1, 5):
+        values = reasons[rng.integers(0, len(reasons), rows)]
+        values[(rng.random(rows) < 0.15 * level) | (tiers == 1)] = None
+        df[f"rejection_criterion_level_{level}"] = values
+
+    df.loc[df.index % 37 == 0, "validation_number"] = np.nan
+    df.loc[df.index % 41 == 0, "design_categorization_number"] = np.nan
+    return df
+
+
+def whole_file_counts(path):
+    """The count tables of the evidence csv at path, read in one piece."""
+    df = read_evidence_csv(path)
+    df["study_year"] = study_year(df["study_date"])
+    normalize_countries(df, "country_of_study", country_dict())
+    return aggregate_tables(build_cube(df, region_dict()))
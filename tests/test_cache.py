@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import src.loaders
+from src.cache import cache_file
+from src.loaders import load_evidence, read_evidence_csv
+
+
+def test_cache_file_evicts_only_the_same_name(tmp_path):
+    old = cache_file("evidence-x", "aaaa", cache_dir=tmp_path)
+    other = cache_file("evidence-x-more", "bbbb", cache_dir=tmp_path)
+    glob_like = cache_file("evidence-[x]", "cccc", cache_dir=tmp_path)
+    for path in (old, other, glob_like):
+        path.write_text("cached")
+
+    new = cache_file("evidence-x", "dddd", cache_dir=tmp_path)
+    assert not old.exists()
+    assert other.exists() and glob_like.exists()
+    assert cache_file("evidence-x", "dddd", cache_dir=tmp_path) == new
+
+
+def test_load_evidence_sidecars(raw, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "evidence.csv"
+    raw.head(200).to_csv(path, index=False)
+
+    reads = []
+    def counting(*args, **kwargs):
+        reads.append(1)
+        return read_evidence_csv(*args, **kwargs)
+    monkeypatch.setattr(src.loaders, "read_evidence_csv", counting)
+
+    full = load_evidence(path)
+    few = load_evidence(path, columns=["study_id", "validation_number"])
+    # both column sets keep their sidecar
+    assert_frame_equal(load_evidence(path), full)
+    assert_frame_equal(load_evidence(path, columns=["study_id", "validation_number"]), few)
+    assert len(reads) == 2
+    assert_frame_equal(full, read_evidence_csv(path))
+
+    # a new export of the csv is read again
+    pd.read_csv(path).head(100).to_csv(path, index=False)
+    os.utime(path, ns=(1, 1))
+    assert len(load_evidence(path)) == 100
+    assert len(reads) == 3
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+from pandas.testing import assert_frame_equal
+
+import src.cache
+from src.cli import run_targets
+
+
+@pytest.fixture
+def ctx(raw, aliases, regions, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # load_evidence's sidecar goes to data/cache
+    raw.to_csv(tmp_path / "evidence.csv", index=False)
+    return {
+        "params": {"evidence_path": "evidence.csv"},
+        "home": tmp_path,
+        "cache_dir": tmp_path / "stages",
+        "aliases": aliases,
+        "regions": regions,
+    }
+
+
+def run(ctx, force=False):
+    logs = []
+    outputs = run_targets(["aggregate"], dict(ctx), force=force, log=logs.append)
+    return outputs["aggregate"], [line.split(":")[0] for line in logs if "up to date" not in line]
+
+
+def test_unchanged_stages_are_skipped(ctx, monkeypatch):
+    cube, ran = run(ctx)
+    assert ran == ["load", "clean", "normalize", "region-map", "aggregate"]
+
+    hashed = []
+    fingerprint = src.cache.file_fingerprint
+    def counting(*paths, content=False):
+        hashed.append(content)
+        return fingerprint(*paths, content=content)
+    monkeypatch.setattr(src.cache, "file_fingerprint", counting)
+
+    cached, ran = run(ctx)
+    assert ran == [] and True not in hashed  # size and mtime unchanged: the csv is not read
+    assert_frame_equal(cached, cube)
+    assert_frame_equal(run(ctx, force=True)[0], cube)
+
+    # a re-synced csv with the same bytes is hashed again, but nothing runs
+    csv = ctx["home"] / "evidence.csv"
+    os.utime(csv, ns=(1, 1))
+    assert run(ctx)[1] == [] and True in hashed
+
+    # new bytes re-run everything downstream of load
+    csv.write_text(csv.read_text().replace("Kenya", "Uganda", 5))
+    assert run(ctx)[1] == ["load", "clean", "normalize", "region-map", "aggregate"]
@@ -0,0 +1,38 @@
+import os
+
+from pandas.testing import assert_frame_equal
+
+import src.cube
+from src.cube import build_cube, load_cube
+from src.process import normalize_evidence
+
+
+def test_load_cube_is_keyed_on_the_source_file(raw, aliases, regions, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "evidence.csv"
+    source.write_text("v1")
+    df = normalize_evidence(raw.copy(), aliases, regions)
+
+    builds = []
+    def counting(*args, **kwargs):
+        builds.append(1)
+        return build_cube(*args, **kwargs)
+    monkeypatch.setattr(src.cube, "build_cube", counting)
+
+    cube = load_cube(df, regions, source=source, country_dict=aliases)
+    assert_frame_equal(cube, build_cube(df, regions))
+    assert_frame_equal(load_cube(df, regions, source=source, country_dict=aliases), cube)
+    assert len(builds) == 1
+
+    # a new export of the csv, other aliases or relabelled tiers each rebuild it
+    source.write_text("v2, longer")
+    os.utime(source, ns=(1, 1))
+    load_cube(df, regions, source=source, country_dict=aliases)
+    load_cube(df, regions, source=source, country_dict={**aliases, "KE": "Kenya (Republic of)"})
+    relabelled = df.assign(validation_number="Tier-" + df["validation_number"].astype(str))
+    load_cube(relabelled, regions, source=source, country_dict=aliases)
+    assert len(builds) == 4
+
+    # without a source there is nothing to key on
+    load_cube(df, regions)
+    assert len(builds) == 5
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.encoding import encode_cells, explode_encoded
+
+
+def test_explode_encoded_pairs():
+    encoded = encode_cells(pd.Series(["Kenya, Chile", None, "Chile", "", "Kenya, Chile"], dtype=object))
+    rows, codes = explode_encoded(encoded)
+    assert rows.tolist() == [0, 0, 2, 4, 4]
+    assert encoded["dictionary"][codes].tolist() == ["Kenya", "Chile", "Chile", "Kenya", "Chile"]
+
+
+@pytest.mark.parametrize("values", [[None, None], ["", " "], ["nan", None], []])
+def test_explode_encoded_without_any_token(values):
+    rows, codes = explode_encoded(encode_cells(pd.Series(values, dtype=object)))
+    assert len(rows) == len(codes) == 0
+    assert rows.dtype == np.int64
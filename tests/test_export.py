@@ -0,0 +1,26 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from src.cube import build_cube, cube_tier_totals
+from src.export import star_schema, write_tables
+from src.process import normalize_evidence
+
+
+def test_star_schema_keeps_products_and_tiers(raw, aliases, regions, tmp_path):
+    evidence_data = normalize_evidence(raw.copy(), aliases, regions)
+    cube = build_cube(evidence_data, regions)
+    tables = star_schema(evidence_data, cube)
+
+    facts = tables["fact_study_product"]
+    pairs = evidence_data[["study_id", "product_id"]].drop_duplicates()
+    assert len(facts[["study_id", "product_id"]].drop_duplicates()) == len(pairs)
+    assert tables["dim_study"]["study_id"].is_unique
+    assert set(tables["dim_study"]["study_id"]) == set(evidence_data["study_id"])
+
+    # the tier distribution is rebuilt from the export alone
+    tiers = facts[["validation_number", "study_id"]].drop_duplicates().groupby("validation_number", observed=True).size()
+    assert tiers.to_dict() == cube_tier_totals(cube).to_dict()
+
+    # and the tables survive parquet
+    path, = write_tables({"fact_study_product": facts}, tmp_path, "parquet")
+    assert_frame_equal(pd.read_parquet(path), facts, check_dtype=False, check_categorical=False)
@@ -0,0 +1,34 @@
+import src.fetch
+from src.fetch import fetch_page
+
+
+class FakeSession:
+    def __init__(self, status_code=200):
+        self.status_code, self.closed = status_code, False
+
+    def get(self, url, headers, timeout):
+        response = type("Response", (), {})()
+        response.status_code, response.text = self.status_code, "<html></html>"
+        response.headers = {"ETag": '"abc"'}
+        response.raise_for_status = lambda: None
+        return response
+
+    def close(self):
+        self.closed = True
+
+
+def test_fetch_page_closes_the_session_it_makes(monkeypatch):
+    monkeypatch.delenv(src.fetch.FIXTURE_ENV, raising=False)
+    made = []
+    monkeypatch.setattr(src.fetch, "make_session", lambda *args, **kwargs: made.append(FakeSession()) or made[-1])
+    assert fetch_page("https://example.org") == ("<html></html>", {"etag": '"abc"', "last_modified": None})
+    assert len(made) == 1 and made[0].closed
+
+
+def test_fetch_page_leaves_a_given_session_open(monkeypatch):
+    monkeypatch.delenv(src.fetch.FIXTURE_ENV, raising=False)
+    session = FakeSession(status_code=304)
+    assert fetch_page("https://example.org", validators={"etag": '"abc"'}, session=session) == (
+        None, {"etag": '"abc"'}
+    )
+    assert not session.closed
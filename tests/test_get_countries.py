@@ -0,0 +1,38 @@
+import src.get_countries
+from src.fetch import fixture_name
+from src.get_countries import refresh_country_aliases, read_alias_cache
+
+WIKI_URL = "https://en.wikipedia.org/wiki/List_of_alternative_country_names"
+ISO_URL = "https://en.wikipedia.org/wiki/ISO_3166-1"
+
+WIKI_PAGE = """<html><body><table class="wikitable sortable">
+<tr><th>Code</th><th>Name</th><th>Alternatives</th></tr>
+<tr><td>NAM</td><td><a href="/wiki/Namibia">Namibia</a></td><td><b>Republic of Namibia</b></td></tr>
+<tr><td>KEN</td><td><a href="/wiki/Kenya">Kenya</a></td><td><b>Republic of Kenya</b></td></tr>
+</table></body></html>"""
+
+ISO_PAGE = """<html><body><table>
+<tr><th>ISO name</th><th>Official name</th><th>Sovereignty</th><th>Alpha-2</th><th>Alpha-3</th><th>Num</th><th>Subdivisions</th><th>TLD</th></tr>
+<tr><td>Namibia</td><td>the Republic of Namibia</td><td>UN member</td><td>NA</td><td>NAM</td><td>516</td><td>ISO 3166-2:NA</td><td>.na</td></tr>
+<tr><td>Kenya</td><td>the Republic of Kenya</td><td>UN member</td><td>KE</td><td>KEN</td><td>404</td><td>ISO 3166-2:KE</td><td>.ke</td></tr>
+</table></body></html>"""
+
+
+def test_snapshot_keeps_namibia_through_a_304_refresh(tmp_path, monkeypatch):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    (pages / fixture_name(WIKI_URL)).write_text(WIKI_PAGE, encoding="utf-8")
+    (pages / fixture_name(ISO_URL)).write_text(ISO_PAGE, encoding="utf-8")
+    cache_path = tmp_path / "country_aliases.json"
+
+    aliases = refresh_country_aliases(WIKI_URL, ISO_URL, {}, cache_path, fixture_dir=pages)
+    assert aliases["NA"] == "Namibia" and aliases["NAM"] == "Namibia"
+    assert "NaN" not in aliases and "null" not in aliases
+
+    # both pages unchanged: the tables come back from the snapshot's records
+    monkeypatch.setattr(
+        src.get_countries, "fetch_pages", lambda pages, *args, **kwargs: {name: (None, None) for name in pages}
+    )
+    again = refresh_country_aliases(WIKI_URL, ISO_URL, {}, cache_path)
+    assert again == aliases
+    assert read_alias_cache(cache_path)["aliases"] == aliases
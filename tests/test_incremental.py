@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import src.incremental
+from src.cube import build_cube
+from src.export import aggregate_tables
+from src.incremental import update_evidence, count_tables
+from src.process import normalize_evidence
+
+
+def expected_tables(raw, aliases, regions):
+    return aggregate_tables(build_cube(normalize_evidence(raw.copy(), aliases, regions), regions))
+
+
+def assert_same_tables(tables, expected):
+    for name, table in expected.items():
+        assert_frame_equal(tables[name].astype(str), table.astype(str), check_dtype=False)
+
+
+def test_first_run_counts_match_the_cube(raw, aliases, regions, tmp_path):
+    _, counts = update_evidence(raw.copy(), aliases, regions, state_path=tmp_path / "state.pkl")
+    assert_same_tables(count_tables(counts), expected_tables(raw, aliases, regions))
+
+
+def test_update_only_normalizes_the_changed_rows(raw, aliases, regions, tmp_path, monkeypatch):
+    state_path = tmp_path / "state.pkl"
+    update_evidence(raw.copy(), aliases, regions, state_path=state_path)
+
+    # drop some rows, change one and add a few new ones
+    changed = raw.drop(index=raw.index[10:30]).reset_index(drop=True)
+    changed.loc[0, "country_of_study"] = "Kenya, Chile"
+    new_rows = raw.tail(5).assign(study_id=["N1", "N2", "N3", "N4", "N5"])
+    changed = pd.concat([changed, new_rows], ignore_index=True)
+    changed["study_id"] = changed["study_id"].astype("string")
+
+    normalized = []
+    def counting(df, *args, **kwargs):
+        normalized.append(len(df))
+        return normalize_evidence(df, *args, **kwargs)
+    monkeypatch.setattr(src.incremental, "normalize_evidence", counting)
+
+    evidence_data, counts = update_evidence(changed.copy(), aliases, regions, state_path=state_path)
+    assert normalized == [6]  # the changed row and the new ones
+
+    expected_rows = normalize_evidence(changed.copy(), aliases, regions)
+    assert_frame_equal(evidence_data, expected_rows, check_dtype=False, check_categorical=False)
+    assert_same_tables(count_tables(counts), expected_tables(changed, aliases, regions))
+
+
+@pytest.mark.parametrize("country", [None, "", "Global"])  # no country, or one without a region
+def test_update_with_rows_without_countries_or_regions(raw, aliases, regions, tmp_path, country):
+    state_path = tmp_path / "state.pkl"
+    update_evidence(raw.copy(), aliases, regions, state_path=state_path)
+
+    new_rows = raw.tail(3).assign(study_id=["N1", "N2", "N3"], country_of_study=country)
+    changed = pd.concat([raw, new_rows], ignore_index=True).astype({"study_id": "string"})
+    evidence_data, counts = update_evidence(changed.copy(), aliases, regions, state_path=state_path)
+
+    assert_frame_equal(
+        evidence_data, normalize_evidence(changed.copy(), aliases, regions), check_dtype=False, check_categorical=False
+    )
+    assert_same_tables(count_tables(counts), expected_tables(changed, aliases, regions))
+
+
+def test_changed_aliases_start_over(raw, aliases, regions, tmp_path):
+    state_path = tmp_path / "state.pkl"
+    update_evidence(raw.copy(), aliases, regions, state_path=state_path)
+
+    renamed = {**aliases, "KE": "Republic of Kenya"}
+    _, counts = update_evidence(raw.copy(), renamed, regions, state_path=state_path)
+    assert_same_tables(count_tables(counts), expected_tables(raw, renamed, regions))
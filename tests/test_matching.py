@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+import src.matching
+from functions import world_country_names
+from src.matching import build_match_index, resolve_countries
+
+ALIASES = {"CI": "Côte d'Ivoire", "KEN": "Kenya", "GB": "United Kingdom"}
+
+
+def test_resolve_countries(tmp_path):
+    names = pd.Series(["cote d'ivoire", "Kenyaa", None, "Gondor", "CI", "kenyaa"], index=range(10, 16))
+    resolved = resolve_countries(names, build_match_index(ALIASES))
+    assert resolved.index.tolist() == names.index.tolist()
+    # folded names, then close ones; codes and names far from any are left unresolved
+    assert resolved.tolist() == ["Côte d'Ivoire", "Kenya", None, None, None, "Kenya"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_resolve_countries_caches_fuzzy_matches(tmp_path, monkeypatch):
+    index = build_match_index(ALIASES)
+    names = pd.Series(["Kenyaa", "Unitd Kingdom"])
+    expected = resolve_countries(names, index, cache_name="test", cache_dir=tmp_path)
+    assert [path.name for path in tmp_path.glob("matches-test-*.json")]
+
+    monkeypatch.setattr(src.matching, "_fuzzy_matches", lambda *args: pytest.fail("matched again"))
+    assert resolve_countries(names, index, cache_name="test", cache_dir=tmp_path).tolist() == expected.tolist()
+
+
+def test_world_country_names_only_fuzzy_when_asked(tmp_path):
+    world = pd.DataFrame({"SUBUNIT": ["Ivory Coast", "Kenya", "Namibia"]})
+    countries = pd.Series(["Côte d'Ivoire", "Kenyaa", "NA", "Gondor"])
+    assert world_country_names(countries, world).tolist() == ["Ivory Coast", "Kenyaa", "Namibia", "Gondor"]
+    assert world_country_names(countries, world, fuzzy=True, cache_dir=tmp_path).tolist() == [
+        "Ivory Coast", "Kenya", "Namibia", "Gondor"
+    ]
+
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.process import study_year, explode_study_years, normalize_countries
+from tests.evidence import raw_evidence
+
+
+@pytest.mark.parametrize("date, year", [
+    ("2019-05-01", 2019),  # full dates
+    ("2021-11", 2021),
+    ("2018", 2018),  # bare years
+    ("2017, 2019", 2017),  # several years: the earliest
+    ("2018-2019", 2018),  # year ranges
+    ("n.d.", pd.NA),  # no year
+    (None, pd.NA),
+    (np.nan, pd.NA),
+])
+def test_study_year(date, year):
+    years = study_year(pd.Series([date], index=[7], dtype=object))
+    assert years.dtype == "Int64" and years.index.tolist() == [7]
+    assert years.iloc[0] is pd.NA if year is pd.NA else years.iloc[0] == year
+
+
+def test_study_year_of_many_dates():
+    dates = pd.Series(["2019", None, "2018-2019", "2019-05-01", "2019"], dtype=object)
+    assert study_year(dates).tolist() == [2019, pd.NA, 2018, 2019, 2019]
+    # every year a date mentions, by row position
+    years = explode_study_years(dates)
+    assert list(zip(years.index, years)) == [(0, 2019), (2, 2018), (2, 2019), (3, 2019), (4, 2019)]
+
+
+def test_study_year_without_any_date():
+    assert study_year(pd.Series([], dtype=object)).tolist() == []
+
+
+ALIASES = {"KE": "Kenya", "CHL": "Chile", "UK": "United Kingdom"}
+REGIONS = {"Kenya": "Sub-Saharan Africa", "Chile": "HIC", "United Kingdom": "HIC"}
+
+
+def test_normalize_countries():
+    df = pd.DataFrame({"country_of_study": ["KE, CHL", "Kenya", " UK ", "Global, KE", None, np.nan, "Kenyaa"]})
+    normalize_countries(df, "country_of_study", ALIASES, REGIONS)
+    assert df["country_of_study"].tolist()[:4] == ["Kenya, Chile", "Kenya", "United Kingdom", "Global, Kenya"]
+    assert df["country_of_study"].tolist()[4] is None and pd.isna(df["country_of_study"].iloc[5])
+    assert df["country_of_study"].iloc[6] == "Kenyaa"  # no fuzzy matching unless asked for
+    # regions of the known countries only, none for cells without any
+    assert df["region"].tolist() == ["Sub-Saharan Africa,HIC", "Sub-Saharan Africa", "HIC", "Sub-Saharan Africa",
+                                     None, None, None]
+
+
+def test_normalize_countries_fuzzy(tmp_path):
+    df = pd.DataFrame({"country_of_study": ["Kenyaa, CHL", "Gondor"]})
+    normalize_countries(df, "country_of_study", ALIASES, fuzzy=True, cache_dir=tmp_path)
+    assert df["country_of_study"].tolist() == ["Kenya, Chile", "Gondor"]
+    assert "region" not in df
+
+
+def test_normalize_countries_matches_the_row_by_row_cleaning(aliases, regions):
+    df = raw_evidence()
+
+    def cleaned(cell):
+        # the row-by-row country cleaning and region lookup normalize_countries replaces
+        if not isinstance(cell, str):
+            return cell, None
+        countries = [aliases.get(country.strip(), country) for country in cell.split(",")]
+        found = [regions[c.strip()] for c in countries if c.strip() in regions]
+        return ", ".join(countries), ",".join(found) or None
+
+    expected = pd.DataFrame(df["country_of_study"].map(cleaned).tolist(), columns=["country_of_study", "region"])
+    normalize_countries(df, "country_of_study", aliases, regions)
+    assert df[["country_of_study", "region"]].equals(expected)
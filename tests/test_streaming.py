@@ -0,0 +1,50 @@
+import pytest
+from pandas.testing import assert_frame_equal
+
+import src.streaming
+from src.streaming import stream_counts
+from tests.evidence import raw_evidence, whole_file_counts, country_dict, region_dict
+
+
+@pytest.mark.parametrize("missing", [True, False])
+@pytest.mark.parametrize("chunksize", [97, 500, 5000])
+def test_chunked_counts_match_the_whole_file(tmp_path, chunksize, missing):
+    path = tmp_path / "evidence.csv"
+    numeric = ["validation_number", "design_categorization_number"]
+    df = raw_evidence().astype({col: "Int64" for col in numeric})  # written as 1, not 1.0
+    if missing:
+        # the first chunks read their tiers and designs as ints, the later ones as floats
+        df.loc[:999, numeric] = df.loc[:999, numeric].fillna(1)
+    else:
+        df = df.dropna(subset=numeric)
+    df.to_csv(path, index=False)
+
+    expected = whole_file_counts(path)
+    tables = stream_counts(path, *_dicts(), chunksize=chunksize, log=lambda message: None)
+    for name, table in expected.items():
+        assert_frame_equal(tables[name], table, check_dtype=False, check_categorical=False)
+        assert tables[name].astype(str).equals(table.astype(str))  # same labels, e.g. 1 and not 1.0
+
+
+def test_chunks_without_any_country(tmp_path):
+    path = tmp_path / "evidence.csv"
+    df = raw_evidence()
+    df.loc[:499, "country_of_study"] = None  # the first chunk has no country at all
+    df.to_csv(path, index=False)
+
+    expected = whole_file_counts(path)
+    tables = stream_counts(path, *_dicts(), chunksize=500, log=lambda message: None)
+    for name, table in expected.items():
+        assert_frame_equal(tables[name], table, check_dtype=False, check_categorical=False)
+
+
+def test_chunk_over_the_limits_is_refused(tmp_path, monkeypatch):
+    path = tmp_path / "evidence.csv"
+    raw_evidence(200).to_csv(path, index=False)
+    monkeypatch.setitem(src.streaming.MAX_CODES, "study_id", 10)
+    with pytest.raises(ValueError, match="study_id"):
+        src.streaming.chunk_partial(next(src.streaming.read_evidence_chunks(path, 200)), *_dicts())
+
+
+def _dicts():
+    return country_dict(), region_dict()
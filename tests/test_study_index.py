@@ -0,0 +1,14 @@
+import pytest
+from pandas.testing import assert_frame_equal
+
+from src.cube import build_cube, cube_long
+from src.process import normalize_evidence
+from src.study_index import build_study_index, index_long
+
+
+@pytest.mark.parametrize("dimension", ["country_of_study", "region", "study_year", "design_categorization_number"])
+@pytest.mark.parametrize("filters", [{}, {"region": "South Asia"}, {"validation_number": [1.0, 2.0]}])
+def test_index_long_matches_cube_long(raw, aliases, regions, dimension, filters):
+    cube = build_cube(normalize_evidence(raw.copy(), aliases, regions), regions)
+    expected = cube_long(cube, dimension, **filters).reset_index(drop=True)
+    assert_frame_equal(index_long(build_study_index(cube), dimension, **filters), expected)
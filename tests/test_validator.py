@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from functions import validator
+from tests.evidence import raw_evidence
+
+LEVELS = [f"rejection_criterion_level_{level}" for level in range(1, 4)]
+
+
+def test_validator_fills_and_flags():
+    df = pd.DataFrame([
+        [1, None, None, None],  # tier 1 without criteria: fine
+        [1, None, "R2", None],  # tier 1 with a criterion
+        [2, None, None, None],  # tier 2 without its criterion
+        [3, "R1", None, None],  # tier 3: level 2 takes level 1
+        [4, None, "R2", None],  # tier 4 without level 1: level 2 is blanked too, level 3 takes level 2
+        [4, "R1", "R2", "R3"],
+    ], columns=["validation_number"] + LEVELS, index=[10, 11, 12, 13, 14, 15])
+
+    flags = validator(df)
+    assert list(flags.itertuples(index=False, name=None)) == [
+        (11, "Flag-0", LEVELS[1]),
+        (12, "Flag-1-0", LEVELS[0]),
+        (13, "Flag-2-1", LEVELS[1]),
+        (14, "Flag-3-0", LEVELS[0]),
+        (14, "Flag-3-1", LEVELS[1]),
+        (14, "Flag-3-2", LEVELS[2]),
+    ]
+    assert df.loc[13, LEVELS].tolist() == ["R1", "R1", None]
+    assert df.loc[14, LEVELS].isna().tolist() == [True, True, False] and df.loc[14, LEVELS[2]] == "R2"
+    assert df.loc[15, LEVELS].tolist() == ["R1", "R2", "R3"]
+
+
+def test_validator_matches_the_row_by_row_checks():
+    df = raw_evidence()
+    expected, flags = df.copy(), []
+    for i, row in df.iterrows():
+        # the row-by-row checks validator replaces, reading each row before its fills
+        keys = [key for key in row.keys() if "rejection_criterion" in key]
+        tier, blank = row["validation_number"], row[keys].isna()
+        if tier == 1 and not blank.all():
+            flags.append((i, "Flag-0", blank.idxmin()))
+        elif tier == 2 and blank.iloc[0]:
+            flags.append((i, "Flag-1-0", keys[0]))
+        elif tier == 3:
+            if blank.iloc[0]:
+                flags.append((i, "Flag-2-0", keys[0]))
+            if blank.iloc[1]:
+                flags.append((i, "Flag-2-1", keys[1]))
+                expected.loc[i, keys[1]] = row[keys[0]]
+        elif tier == 4:
+            if blank.iloc[0]:
+                flags += [(i, "Flag-3-0", keys[0]), (i, "Flag-3-1", keys[1])]
+                expected.loc[i, keys[1]] = row[keys[0]]
+            if blank.iloc[2]:
+                flags.append((i, "Flag-3-2", keys[2]))
+                expected.loc[i, keys[2]] = row[keys[1]]
+
+    found = validator(df)
+    assert list(found.itertuples(index=False, name=None)) == flags
+    assert df.fillna(np.nan).equals(expected.fillna(np.nan))
@@ -0,0 +1,24 @@
+import pytest
+
+import functions
+from functions import load_world
+
+gpd = pytest.importorskip("geopandas")
+shapely = pytest.importorskip("shapely.geometry")
+
+
+def test_load_world_keeps_a_cache_entry_per_column_set(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "world.shp"
+    gpd.GeoDataFrame(
+        {"SUBUNIT": ["Kenya", "Chile"], "ISO_A3": ["KEN", "CHL"]},
+        geometry=[shapely.Point(37, 0), shapely.Point(-71, -33)],
+        crs="EPSG:4326",
+    ).to_file(path)
+
+    assert list(load_world(path).columns) == ["SUBUNIT", "geometry"]
+    assert list(load_world(path, columns=("SUBUNIT", "ISO_A3")).columns) == ["SUBUNIT", "ISO_A3", "geometry"]
+
+    functions._load_world.cache_clear()  # read from the pickles this time
+    assert list(load_world(path, columns=("ISO_A3",)).columns) == ["ISO_A3", "geometry"]
+    assert list(load_world(path).columns) == ["SUBUNIT", "geometry"]